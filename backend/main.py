@@ -1,8 +1,9 @@
-from fastapi import FastAPI, HTTPException, File, UploadFile, Form
+from fastapi import FastAPI, HTTPException, File, UploadFile, Form, Request, Response, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 import httpx
 from supabase import create_client, Client
+from postgrest.exceptions import APIError
 from openai import OpenAI
 from pydantic import BaseModel
 import os
@@ -10,8 +11,25 @@ import base64
 from typing import Optional, List
 from agents import Agent, Runner, WebSearchTool
 import asyncio
+import csv
+import gzip
+import heapq
+import io
+import json
+import logging
+import math
+import queue
+import threading
 import time
+import uuid
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
 from functools import wraps
+from urllib.parse import quote
+
+logger = logging.getLogger(__name__)
 
 # load env from root dir
 root_dir = os.path.dirname(os.path.dirname(__file__))
@@ -69,9 +87,137 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Idempotent-Replayed", "Auction-Cursor"],
 )
 
 
+# ============================================
+# ASYNC DATA ACCESS (POOLED POSTGREST CLIENT)
+# ============================================
+# Read endpoints declared `async def` query PostgREST through one shared
+# httpx.AsyncClient with keep-alive connections, instead of holding a worker
+# thread while the blocking supabase client waits on the network. Independent
+# queries run concurrently with asyncio.gather.
+# Query builders mirror the supabase client (select/eq/in_/order/limit, then
+# `await ... .execute()` returning an object with .data), so code reads the same.
+# Endpoints tied to the thread-based caches and bid machinery stay sync.
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "50"))  # max concurrent PostgREST connections
+DB_TIMEOUT = float(os.getenv("DB_TIMEOUT", "10"))  # seconds
+DB_RETRIES = 3
+
+
+class AsyncResult:
+    def __init__(self, data):
+        self.data = data
+
+
+class AsyncQuery:
+    """Read query against one PostgREST table"""
+
+    def __init__(self, db: "AsyncPostgrest", table: str):
+        self.db = db
+        self.table = table
+        self.params = [("select", "*")]
+        self.orders = []
+
+    def select(self, columns: str = "*"):
+        self.params[0] = ("select", columns)
+        return self
+
+    def eq(self, column: str, value):
+        self.params.append((column, f"eq.{value}"))
+        return self
+
+    def in_(self, column: str, values):
+        quoted = ",".join('"' + str(v).replace('"', '\\"') + '"' for v in values)
+        self.params.append((column, f"in.({quoted})"))
+        return self
+
+    def or_(self, filters: str):
+        self.params.append(("or", f"({filters})"))
+        return self
+
+    def order(self, column: str, desc: bool = False):
+        self.orders.append(f"{column}.{'desc' if desc else 'asc'}")
+        return self
+
+    def limit(self, count: int):
+        self.params.append(("limit", str(count)))
+        return self
+
+    async def execute(self) -> AsyncResult:
+        params = list(self.params)
+        if self.orders:
+            params.append(("order", ",".join(self.orders)))
+        return AsyncResult(await self.db.get(self.table, params))
+
+
+class AsyncPostgrest:
+    """Shared pooled async client for PostgREST reads"""
+
+    def __init__(self, url: str, key: str):
+        self.base_url = f"{url}/rest/v1" if url else None
+        self.headers = {"apikey": key or "", "Authorization": f"Bearer {key}"}
+        self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                timeout=DB_TIMEOUT,
+                limits=httpx.Limits(max_connections=DB_POOL_SIZE, max_keepalive_connections=DB_POOL_SIZE),
+            )
+        return self._client
+
+    def table(self, name: str) -> AsyncQuery:
+        return AsyncQuery(self, name)
+
+    async def get(self, table: str, params: list) -> list:
+        last_error = None
+        for attempt in range(DB_RETRIES):
+            try:
+                res = await self.client.get(f"/{table}", params=params)
+                break
+            except (httpx.ReadError, httpx.ConnectError, httpx.TimeoutException) as e:
+                last_error = e
+                if attempt < DB_RETRIES - 1:
+                    await asyncio.sleep(0.5 * (attempt + 1))
+        else:
+            raise HTTPException(503, f"Service temporarily unavailable after {DB_RETRIES} retries: {str(last_error)}")
+        if res.status_code >= 400:
+            try:
+                raise APIError(res.json())
+            except ValueError:
+                raise APIError({"message": res.text, "code": str(res.status_code)})
+        return res.json()
+
+    async def select_in(self, table: str, column: str, values: list, columns: str = "*") -> list:
+        """Rows whose column is in values, fetched in concurrent IN_FILTER_CHUNK-sized requests"""
+        if not values:
+            return []
+        pages = await asyncio.gather(*[
+            self.table(table).select(columns).in_(column, chunk).execute()
+            for chunk in chunked(values)
+        ])
+        return [row for page in pages for row in page.data]
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+async_db = AsyncPostgrest(SUPABASE_URL, SUPABASE_KEY)
+
+
+@app.on_event("shutdown")
+async def close_async_db():
+    await async_db.close()
+
+
 @app.get("/")
 def root():
     return {"message": "all good"}
@@ -117,49 +263,146 @@ async def simple_generate_description(req: SimpleDescriptionRequest):
     return {"description": text}
 
 
-from fastapi.responses import FileResponse
+from fastapi.responses import StreamingResponse
 import tempfile
 from openpyxl import Workbook
 
+EXPORT_PAGE_SIZE = 1000  # rows per query while exporting (PostgREST's default max rows)
+EXPORT_SPOOL_SIZE = 8 * 1024 * 1024  # workbook bytes kept in memory before spilling to an anonymous temp file
+EXPORT_STREAM_CHUNK = 64 * 1024
+
+
 @app.get("/auctions/{auction_id}/excel")
 def export_excel(auction_id: str):
+    """
+    Export an auction as an Excel workbook with Lots, Bid History, Settlement and Comps sheets.
+    Data is read in pages and written to write-only worksheets, so memory stays flat for
+    large auctions; the file is streamed back and nothing is left on disk.
+    """
     # Fetch auction
     auction = supabase.table("auctions").select("*").eq("auction_id", auction_id).execute()
     if not auction.data:
         raise HTTPException(404, "Auction not found")
     auction = auction.data[0]
 
-    # Fetch items
-    items = supabase.table("items").select("*").eq("auction_id", auction_id).execute().data
-
-    # Create workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Items"
-
-    # Header
-    ws.append(["Title", "Brand", "Model", "Year", "Image 1 URL"])
-
-    # Rows
-    for item in items:
-        ws.append([
-            item.get("title", ""),
-            item.get("brand", ""),
-            item.get("model", ""),
-            item.get("year", ""),
-            item.get("image_url_1", ""),
-        ])
-
-    # Save to temp file
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx")
-    wb.save(temp_file.name)
+    # write-only workbook into a spooled file: memory up to EXPORT_SPOOL_SIZE, then
+    # an unnamed temp file that disappears when closed
+    output = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+    try:
+        wb = Workbook(write_only=True)
+        titles = write_lots_sheet(wb.create_sheet("Lots"), auction_id)
+        item_ids = list(titles)
+        write_bid_history_sheet(wb.create_sheet("Bid History"), item_ids, titles)
+        write_settlement_sheet(wb.create_sheet("Settlement"), auction_id, titles)
+        write_comps_sheet(wb.create_sheet("Comps"), item_ids, titles)
+        wb.save(output)
+        output.seek(0)
+    except Exception:
+        output.close()
+        raise
 
-    return FileResponse(
-        temp_file.name,
+    def stream():
+        try:
+            while chunk := output.read(EXPORT_STREAM_CHUNK):
+                yield chunk
+        finally:
+            output.close()
+
+    filename = f"{auction.get('auction_name') or auction_id}.xlsx"
+    ascii_name = filename.encode("ascii", "replace").decode().replace('"', "'")
+    return StreamingResponse(
+        stream(),
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        filename=f"{auction['auction_name']}.xlsx"
+        headers={"Content-Disposition": f"attachment; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename)}"}
     )
 
+
+def iter_pages(build_query, page_size: int = EXPORT_PAGE_SIZE):
+    """Yield rows of a query page by page; build_query must order by a unique key"""
+    offset = 0
+    while True:
+        rows = build_query().range(offset, offset + page_size - 1).execute().data or []
+        yield from rows
+        if len(rows) < page_size:
+            return
+        offset += page_size
+
+
+def write_lots_sheet(ws, auction_id: str) -> dict:
+    """One row per item with its primary image and bid summary; returns item_id -> title"""
+    ws.append(["Title", "Brand", "Model", "Year", "Starting Bid", "Min Increment", "Buy Now Price",
+               "Highest Bid", "Bid Count", "Listed", "Sold", "Primary Image URL", "Description"])
+    titles = {}
+    page = []
+
+    def flush():
+        item_ids = [item["item_id"] for item in page]
+        images = {}
+        for chunk in chunked(item_ids):
+            res = supabase.table("item_images").select("item_id, url, position").in_("item_id", chunk).execute()
+            for img in res.data or []:
+                if img["item_id"] not in images or img["position"] < images[img["item_id"]]["position"]:
+                    images[img["item_id"]] = img
+        summaries = bid_summaries.get_many(item_ids)
+        for item in page:
+            summary = summaries.get(item["item_id"]) or {}
+            ws.append([
+                item.get("title", ""),
+                item.get("brand", ""),
+                item.get("model", ""),
+                item.get("year", ""),
+                item.get("starting_bid"),
+                item.get("min_increment"),
+                item.get("buy_now_price"),
+                summary.get("highest_bid"),
+                summary.get("bid_count", 0),
+                bool(item.get("is_listed")),
+                bool(item.get("is_sold")),
+                (images.get(item["item_id"]) or {}).get("url", ""),
+                item.get("ai_description") or "",
+            ])
+        page.clear()
+
+    for item in iter_pages(lambda: supabase.table("items").select("*").eq("auction_id", auction_id).order("created_at").order("item_id")):
+        titles[item["item_id"]] = item.get("title", "")
+        page.append(item)
+        if len(page) >= EXPORT_PAGE_SIZE:
+            flush()
+    if page:
+        flush()
+    return titles
+
+
+def write_bid_history_sheet(ws, item_ids: list, titles: dict):
+    ws.append(["Lot", "Bidder Name", "Bidder Email", "Amount", "Placed At"])
+    for chunk in chunked(item_ids):
+        bids = iter_pages(lambda: supabase.table("bids").select(
+            "bid_id, item_id, bidder_name, bidder_email, amount, created_at"
+        ).in_("item_id", chunk).order("item_id").order("amount", desc=True).order("bid_id"))
+        for bid in bids:
+            ws.append([titles.get(bid["item_id"], ""), bid.get("bidder_name"), bid.get("bidder_email"),
+                       bid.get("amount"), bid.get("created_at")])
+
+
+def write_settlement_sheet(ws, auction_id: str, titles: dict):
+    ws.append(["Lot", "Buyer Name", "Buyer Email", "Amount", "Order Type", "Created At"])
+    orders = iter_pages(lambda: supabase.table("orders").select(
+        "order_id, item_id, buyer_name, buyer_email, amount, order_type, created_at"
+    ).eq("auction_id", auction_id).order("created_at").order("order_id"))
+    for order in orders:
+        ws.append([titles.get(order["item_id"], ""), order.get("buyer_name"), order.get("buyer_email"),
+                   order.get("amount"), order.get("order_type"), order.get("created_at")])
+
+
+def write_comps_sheet(ws, item_ids: list, titles: dict):
+    ws.append(["Lot", "Source", "Sold Price", "Currency", "Sold At", "URL", "Notes"])
+    for chunk in chunked(item_ids):
+        comps = iter_pages(lambda: supabase.table("comps").select("*").in_("item_id", chunk).order("item_id").order("comp_id"))
+        for comp in comps:
+            ws.append([titles.get(comp["item_id"], ""), comp.get("source"), comp.get("sold_price"),
+                       comp.get("currency"), comp.get("sold_at"), comp.get("url_comp") or comp.get("source_url"),
+                       comp.get("notes")])
+
 # PROFILE ENDPOINTS
 
 # create a new user/profile
@@ -189,9 +432,9 @@ def create_user(email: str, role: str = "staff"):
 
 # get one user by id
 @app.get("/users/{profile_id}")
-def get_user(profile_id: str):
+async def get_user(profile_id: str):
     # lookup user
-    user = supabase.table("profiles").select("*").eq("profile_id", profile_id).execute()
+    user = await async_db.table("profiles").select("*").eq("profile_id", profile_id).execute()
     if not user.data:
         raise HTTPException(404, "User not found")
     return user.data[0]
@@ -213,6 +456,7 @@ def update_user_email(profile_id: str, email: str):
     res = supabase.table("profiles").update({"email": email.strip()}).eq("profile_id", profile_id).execute()
     if not res.data:
         raise HTTPException(500, "Failed to update email")
+    profile_status_cache.invalidate(profile_id)
     return res.data[0]
 
 # activate user account
@@ -227,6 +471,7 @@ def make_payment(profile_id: str):
     result = supabase.table("profiles").update({"is_active": True}).eq("profile_id", profile_id).execute()
     if not result.data:
         raise HTTPException(500, "Failed to update payment status")
+    profile_status_cache.invalidate(profile_id)
 
     return {"message": "Payment successful", "profile_id": profile_id, "is_active": True}
 
@@ -241,8 +486,8 @@ def create_auction(profile_id: str, auction_name: str):
         raise HTTPException(400, "Auction name cannot be empty")
 
     # Check if profile exists - if not, auto-create it for new Supabase Auth users
-    prof = supabase.table("profiles").select("profile_id, is_active").eq("profile_id", profile_id).execute()
-    if not prof.data:
+    is_active = profile_is_active(profile_id)
+    if is_active is None:
         # Auto-create profile for new users (from Supabase Auth)
         new_profile = supabase.table("profiles").insert({
             "profile_id": profile_id,
@@ -251,7 +496,8 @@ def create_auction(profile_id: str, auction_name: str):
         }).execute()
         if not new_profile.data:
             raise HTTPException(500, "Failed to create user profile")
-    elif not prof.data[0]["is_active"]:
+        profile_status_cache.invalidate(profile_id)
+    elif not is_active:
         raise HTTPException(403, "User is not active")
 
     # create auction
@@ -262,25 +508,24 @@ def create_auction(profile_id: str, auction_name: str):
     if not result.data:
         raise HTTPException(500, "Failed to create auction")
 
+    auction_owner_cache.invalidate(result.data[0]["auction_id"])
     return result.data[0]
 
 # GET auction by id
 @app.get("/auctions/{auction_id}")
-@retry_on_error(max_retries=3, delay=0.5)
-def get_auction(auction_id: str):
-    # find auction
-    auction = supabase.table("auctions").select("*").eq("auction_id", auction_id).execute()
-    if not auction.data:
+async def get_auction(auction_id: str):
+    # find auction (entity cache)
+    auction = await entity_cache.auction_async(auction_id)
+    if auction is None:
         raise HTTPException(404, "Auction not found")
-    return auction.data[0]
+    return auction
 
 # GET all auctions for a user
 @app.get("/auctions")
-@retry_on_error(max_retries=3, delay=0.5)
-def list_auctions_by_user(profile_id: str):
+async def list_auctions_by_user(profile_id: str):
     # Get all auctions for this user (don't require profile to exist in profiles table)
     # New users from Supabase Auth may not have a profiles entry yet
-    auctions = supabase.table("auctions").select("*").eq("profile_id", profile_id).order("created_at", desc=True).execute()
+    auctions = await async_db.table("auctions").select("*").eq("profile_id", profile_id).order("created_at", desc=True).execute()
     if not auctions.data:
         return {"message": "No auctions found for this user", "auctions": []}
 
@@ -290,60 +535,93 @@ def list_auctions_by_user(profile_id: str):
 @app.put("/auctions/{auction_id}")
 def update_auction(auction_id: str, auction_name: str):
     # check auction exists
-    auction = supabase.table("auctions").select("auction_id").eq("auction_id", auction_id).execute()
-    if not auction.data:
+    if entity_cache.auction(auction_id) is None:
         raise HTTPException(404, "Auction not found")
 
     # update name
     res = supabase.table("auctions").update({"auction_name": auction_name.strip()}).eq("auction_id", auction_id).execute()
     if not res.data:
         raise HTTPException(500, "Failed to update auction")
+    note_auction_change(auction_id, {"type": "auction", "auction": res.data[0]})
     return res.data[0]
 
-# DELETE auction (with cascade deletion of related data)
-@app.delete("/auctions/{auction_id}")
+# DELETE auction (with cascade deletion of related data, as a background job)
+@app.delete("/auctions/{auction_id}", status_code=202)
 def delete_auction(auction_id: str):
+    """Start deleting an auction and all of its data; poll GET /jobs/{job_id} for progress"""
     # Check auction exists
     auction = supabase.table("auctions").select("auction_id").eq("auction_id", auction_id).execute()
     if not auction.data:
         raise HTTPException(404, "Auction not found")
 
-    # Get all items in this auction
-    items_response = supabase.table("items").select("item_id").eq("auction_id", auction_id).execute()
-    item_ids = [item["item_id"] for item in items_response.data] if items_response.data else []
+    job = jobs.start("delete_auction", auction_id, lambda job: delete_auction_data(auction_id, job))
+    return {
+        "message": "Auction deletion started",
+        "auction_id": auction_id,
+        "job": job.to_dict()
+    }
 
-    if item_ids:
-        # delete all comps for these items
-        try:
-            for item_id in item_ids:
-                supabase.table("comps").delete().eq("item_id", item_id).execute()
-        except Exception:
-            pass
 
-        # delete all item_images for these items
-        try:
-            for item_id in item_ids:
-                supabase.table("item_images").delete().eq("item_id", item_id).execute()
-        except Exception:
-            pass
+# Child rows are deleted before their parents, one set-based delete per table and chunk
+AUCTION_CHILD_TABLES = ["bids", "orders", "comps", "item_images"]
 
-        # delete all items in this auction
-        try:
-            supabase.table("items").delete().eq("auction_id", auction_id).execute()
-        except Exception as e:
-            raise HTTPException(500, f"Failed to delete items: {str(e)}")
 
-    # Step 4: Finally delete the auction itself
+def delete_auction_data(auction_id: str, job: "Job") -> dict:
+    """Delete an auction with its items, bids, orders, comps and images; returns rows deleted per table"""
+    # bids the engine accepted for this auction must land before their items go
+    bid_engine.invalidate_auction(auction_id)
+    if BID_ENGINE_ENABLED and not bid_engine.wait_flushed():
+        raise HTTPException(503, "Bid engine has unflushed bids, retry deletion shortly")
     try:
-        supabase.table("auctions").delete().eq("auction_id", auction_id).execute()
-    except Exception as e:
-        raise HTTPException(500, f"Failed to delete auction: {str(e)}")
+        # the RPC only returns counts, so note the item ids for the cache cleanup first
+        item_ids = [item["item_id"] for item in iter_pages(
+            lambda: supabase.table("items").select("item_id").eq("auction_id", auction_id).order("item_id")
+        )]
+        res = supabase.rpc("delete_auction_cascade", {"p_auction_id": auction_id}).execute()
+        deleted = res.data or {}
+        job.progress(deleted.get("items", 0), deleted.get("items", 0))
+    except APIError as e:
+        if e.code != "PGRST202":
+            raise
+        # function not deployed yet - chunked set-based deletes; a failure stops
+        # the job and re-running it picks up where it left off
+        deleted, item_ids = delete_auction_data_chunked(auction_id, job)
 
-    return {
-        "message": "Auction and all related data deleted successfully",
-        "auction_id": auction_id,
-        "deleted_items": len(item_ids)
-    }
+    auction_lifecycle.forget(auction_id)
+    bid_engine.invalidate_auction(auction_id)
+    auction_owner_cache.invalidate(auction_id)
+    if item_ids:
+        bid_summaries.forget(item_ids)
+        pricing_stats.forget(item_ids)
+    note_auction_change(auction_id, {"type": "reset"})
+    return deleted
+
+
+def delete_auction_data_chunked(auction_id: str, job: "Job"):
+    deleted = {table: 0 for table in AUCTION_CHILD_TABLES + ["items", "auctions"]}
+    total = supabase.table("items").select("item_id", count="exact").eq("auction_id", auction_id).limit(1).execute()
+    job.progress(0, total.count or 0)
+
+    # take the auction's items a chunk at a time until none are left
+    item_ids = []
+    while True:
+        items = supabase.table("items").select("item_id").eq("auction_id", auction_id).limit(IN_FILTER_CHUNK).execute()
+        chunk = [item["item_id"] for item in items.data or []]
+        if not chunk:
+            break
+        for table in AUCTION_CHILD_TABLES:
+            res = supabase.table(table).delete().in_("item_id", chunk).execute()
+            deleted[table] += len(res.data or [])
+        res = supabase.table("items").delete().in_("item_id", chunk).execute()
+        deleted["items"] += len(res.data or [])
+        item_ids.extend(chunk)
+        job.progress(len(item_ids))
+
+    res = supabase.table("orders").delete().eq("auction_id", auction_id).execute()
+    deleted["orders"] += len(res.data or [])
+    res = supabase.table("auctions").delete().eq("auction_id", auction_id).execute()
+    deleted["auctions"] += len(res.data or [])
+    return deleted, item_ids
 
 # ============================================
 # ITEM ENDPOINTS
@@ -364,16 +642,8 @@ def create_item(
     year: int | None = None,
     ai_description: str = ""
 ):
-    # check auction exists
-    auction = supabase.table("auctions").select("auction_id, profile_id").eq("auction_id", auction_id).execute()
-    if not auction.data:
-        raise HTTPException(404, "Auction not found")
-    
-    # verify profile is active
-    profile_id = auction.data[0]["profile_id"]
-    prof = supabase.table("profiles").select("is_active").eq("profile_id", profile_id).execute()
-    if not prof.data or not prof.data[0]["is_active"]:
-        raise HTTPException(403, "User is not active")
+    # check auction exists and its profile is active (cached)
+    require_active_owner(auction_id)
 
     # gather images and basic check 1..5
     images = [u.strip() for u in [image_url_1, image_url_2, image_url_3, image_url_4, image_url_5] if u and u.strip()]
@@ -411,124 +681,212 @@ def create_item(
         supabase.table("items").delete().eq("item_id", item_id).execute()
         raise HTTPException(500, "Failed to add item images")
 
+    change_log.remember_item(item_id, auction_id)
+    note_auction_change(auction_id, {"type": "item_created", "item": item, "images": imgs_res.data})
+
     # return both
     return {"item": item, "images": imgs_res.data}
 
+# IMPORT items in bulk from a CSV or XLSX manifest
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))  # items per insert
+IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", "5000"))
+IMPORT_IMAGE_COLUMNS = ["image_url_1", "image_url_2", "image_url_3", "image_url_4", "image_url_5"]
+
+
+@app.post("/auctions/{auction_id}/items/import")
+def import_items(auction_id: str, file: UploadFile = File(...)):
+    """
+    Create many items from a CSV or XLSX file with a header row.
+    Columns (any order, case-insensitive): title, image_url_1..image_url_5, brand, model, year, ai_description.
+    Rows are validated as they are read; valid rows are written in batched inserts and
+    every rejected row is reported with its row number.
+    """
+    # check auction exists and profile is active, once for the whole file
+    require_active_owner(auction_id)
+
+    errors = []
+    valid = []  # (row number, item row, image urls)
+    for row_number, row in read_manifest(file):
+        if len(valid) + len(errors) >= IMPORT_MAX_ROWS:
+            raise HTTPException(400, f"Import is limited to {IMPORT_MAX_ROWS} rows per file")
+        try:
+            item, images = parse_import_row(auction_id, row)
+            valid.append((row_number, item, images))
+        except ValueError as e:
+            errors.append({"row": row_number, "error": str(e)})
+
+    created_ids = []
+    for batch in chunked(valid, IMPORT_BATCH_SIZE):
+        try:
+            item_res = supabase.table("items").insert([item for _, item, _ in batch]).execute()
+            items = item_res.data or []
+            if len(items) != len(batch):
+                raise HTTPException(500, "Failed to create items")
+        except Exception as e:
+            errors.extend({"row": row_number, "error": f"Failed to create item: {e}"} for row_number, _, _ in batch)
+            continue
+
+        # inserted rows come back in input order
+        image_rows = [
+            {"item_id": item["item_id"], "url": url, "position": i + 1}
+            for item, (_, _, images) in zip(items, batch)
+            for i, url in enumerate(images)
+        ]
+        batch_ids = [item["item_id"] for item in items]
+        try:
+            imgs_res = supabase.table("item_images").insert(image_rows).execute()
+            if not imgs_res.data:
+                raise HTTPException(500, "Failed to add item images")
+        except Exception as e:
+            # delete the batch's items if images failed so we don't leave orphans
+            supabase.table("items").delete().in_("item_id", batch_ids).execute()
+            errors.extend({"row": row_number, "error": f"Failed to add item images: {e}"} for row_number, _, _ in batch)
+            continue
+
+        for item_id in batch_ids:
+            change_log.remember_item(item_id, auction_id)
+        created_ids.extend(batch_ids)
+
+    if created_ids:
+        note_auction_change(auction_id, {"type": "reset"})
+
+    errors.sort(key=lambda e: e["row"])
+    return {
+        "auction_id": auction_id,
+        "created": len(created_ids),
+        "failed": len(errors),
+        "item_ids": created_ids,
+        "errors": errors
+    }
+
+
+def read_manifest(file: UploadFile):
+    """Yield (row number, {column: value}) for each non-empty data row of a CSV or XLSX upload"""
+    name = (file.filename or "").lower()
+    if name.endswith(".xlsx"):
+        from openpyxl import load_workbook
+        try:
+            wb = load_workbook(file.file, read_only=True, data_only=True)
+        except Exception:
+            raise HTTPException(400, "Could not read the XLSX file")
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            header = [str(h or "").strip().lower().replace(" ", "_") for h in next(rows, [])]
+            for row_number, values in enumerate(rows, start=2):
+                if any(v not in (None, "") for v in values):
+                    yield row_number, dict(zip(header, values))
+        finally:
+            wb.close()
+    elif name.endswith(".csv"):
+        reader = csv.reader(io.TextIOWrapper(file.file, encoding="utf-8-sig", newline=""))
+        # rows are decoded as they are read, so a bad byte can surface on any row
+        try:
+            header = [h.strip().lower().replace(" ", "_") for h in next(reader, [])]
+            for row_number, values in enumerate(reader, start=2):
+                if any(v.strip() for v in values):
+                    yield row_number, dict(zip(header, values))
+        except (UnicodeDecodeError, csv.Error):
+            raise HTTPException(400, "Could not read the CSV file")
+    else:
+        raise HTTPException(400, "File must be a .csv or .xlsx manifest")
+
+
+def parse_import_row(auction_id: str, row: dict):
+    """Validate one manifest row the same way create_item does; raises ValueError with the reason"""
+    def text(column):
+        value = row.get(column)
+        return str(value).strip() if value is not None else ""
+
+    title = text("title")
+    if not title:
+        raise ValueError("title is required")
+    images = [text(c) for c in IMPORT_IMAGE_COLUMNS if text(c)]
+    if not images:
+        raise ValueError("At least one image URL is required")
+
+    year = None
+    if text("year"):
+        try:
+            year = int(float(text("year")))
+        except ValueError:
+            raise ValueError(f"year must be a number, got '{text('year')}'")
+
+    item = {
+        "auction_id": auction_id,
+        "title": title,
+        "brand": text("brand") or "Unknown",
+        "model": text("model") or "Unknown",
+        "year": year,
+        "ai_description": text("ai_description") or None,
+        "is_listed": False
+    }
+    return item, images
+
+
 # GET all items for an auction
 @app.get("/items")
-@retry_on_error(max_retries=3, delay=0.5)
-def list_items(auction_id: str = None, profile_id: str = None):
+async def list_items(
+    request: Request,
+    auction_id: str = None,
+    profile_id: str = None,
+    include_images: bool = True,
+    include_comps: bool = True,
+    limit: int = None,
+    after: str = None,
+    stream: bool = False
+):
     """
-    Get items by auction_id OR get all items across all auctions for a profile_id
+    Get items by auction_id OR get all items across all auctions for a profile_id.
+    include_images / include_comps = false skip those lookups; price_stats and
+    suggested_starting_price come from the pricing stats store either way.
+    For profile_id, newest first:
+      limit / after   -> one page; pass next_after back as after= for the next one
+      stream=true     -> every item as NDJSON (one item per line), hydrated in chunks
+    Without either, all of the profile's items are returned at once.
     """
     if auction_id:
-        # get items for specific auction
-        auction = supabase.table("auctions").select("auction_id").eq("auction_id", auction_id).execute()
+        # get auction and its items concurrently
+        auction, items = await asyncio.gather(
+            async_db.table("auctions").select("auction_id").eq("auction_id", auction_id).execute(),
+            async_db.table("items").select("*").eq("auction_id", auction_id).order("created_at", desc=True).execute(),
+        )
         if not auction.data:
             raise HTTPException(404, "Auction not found")
-
-        items = supabase.table("items").select("*").eq("auction_id", auction_id).order("created_at", desc=True).execute()
         if not items.data:
             return {"message": "No items found for this auction", "items": []}
 
-        # get images
-        item_ids = [i["item_id"] for i in items.data]
-        imgs = supabase.table("item_images").select("*").in_("item_id", item_ids).execute()
-        images = imgs.data if imgs.data else []
-
-        # get comps for all items
-        comps = supabase.table("comps").select("*").in_("item_id", item_ids).execute()
-        comps_data = comps.data if comps.data else []
-
-        # group images by item_id
-        grouped_images = {}
-        for img in images:
-            iid = img["item_id"]
-            if iid not in grouped_images:
-                grouped_images[iid] = []
-            grouped_images[iid].append(img)
-
-        # group comps by item_id and calculate suggested starting price
-        grouped_comps = {}
-        for comp in comps_data:
-            iid = comp["item_id"]
-            if iid not in grouped_comps:
-                grouped_comps[iid] = []
-            grouped_comps[iid].append(comp)
-
-        # attach images, comps, and suggested_starting_price to items
-        for it in items.data:
-            it["images"] = grouped_images.get(it["item_id"], [])
-            item_comps = grouped_comps.get(it["item_id"], [])
-            it["comps"] = item_comps
-            
-            # Calculate suggested starting price: average of comps * 0.8, rounded down to nearest 5
-            if item_comps:
-                avg_price = sum(c.get("sold_price", 0) for c in item_comps) / len(item_comps)
-                raw_suggested = avg_price * 0.8
-                it["suggested_starting_price"] = int(raw_suggested // 5) * 5  # Round down to nearest 5
-            else:
-                it["suggested_starting_price"] = None
-
-        return {"auction_id": auction_id, "items": items.data}
+        await hydrate_items(items.data, include_images, include_comps)
+        return maybe_fast_json({"auction_id": auction_id, "items": items.data}, request)
 
     elif profile_id:
         # get all items across all auctions for this profile
         try:
             # Don't require profile to exist in profiles table - just check auctions directly
             # New users from Supabase Auth may not have a profiles entry yet
-            auctions = supabase.table("auctions").select("auction_id").eq("profile_id", profile_id).execute()
+            auctions = await async_db.table("auctions").select("auction_id").eq("profile_id", profile_id).execute()
             if not auctions.data:
                 return {"message": "No auctions found for this user", "items": []}
 
             auction_ids = [a["auction_id"] for a in auctions.data]
 
+            if stream:
+                return StreamingResponse(
+                    stream_profile_items(auction_ids, include_images, include_comps),
+                    media_type="application/x-ndjson"
+                )
+            if limit is not None or after:
+                page_size = min(max(limit or ITEMS_PAGE_SIZE, 1), ITEMS_MAX_PAGE_SIZE)
+                page, next_after = await profile_items_page(auction_ids, page_size, after)
+                await hydrate_items(page, include_images, include_comps)
+                return maybe_fast_json({"profile_id": profile_id, "items": page, "next_after": next_after}, request)
+
             # get all items in these auctions
-            items = supabase.table("items").select("*").in_("auction_id", auction_ids).order("created_at", desc=True).execute()
+            items = await async_db.table("items").select("*").in_("auction_id", auction_ids).order("created_at", desc=True).execute()
             if not items.data:
                 return {"message": "No items found for this user", "items": []}
 
-            # get images
-            item_ids = [i["item_id"] for i in items.data]
-            imgs = supabase.table("item_images").select("*").in_("item_id", item_ids).execute()
-            images = imgs.data if imgs.data else []
-
-            # get comps for all items
-            comps = supabase.table("comps").select("*").in_("item_id", item_ids).execute()
-            comps_data = comps.data if comps.data else []
-
-            # group images by item_id
-            grouped_images = {}
-            for img in images:
-                iid = img["item_id"]
-                if iid not in grouped_images:
-                    grouped_images[iid] = []
-                grouped_images[iid].append(img)
-
-            # group comps by item_id
-            grouped_comps = {}
-            for comp in comps_data:
-                iid = comp["item_id"]
-                if iid not in grouped_comps:
-                    grouped_comps[iid] = []
-                grouped_comps[iid].append(comp)
-
-            # attach images, comps, and suggested_starting_price to items
-            for it in items.data:
-                it["images"] = grouped_images.get(it["item_id"], [])
-                item_comps = grouped_comps.get(it["item_id"], [])
-                it["comps"] = item_comps
-                
-                # Calculate suggested starting price: average of comps * 0.8
-                if item_comps:
-                    # Calculate suggested starting price: average of comps * 0.8, rounded down to nearest 5
-                    avg_price = sum(c.get("sold_price", 0) for c in item_comps) / len(item_comps)
-                    raw_suggested = avg_price * 0.8
-                    it["suggested_starting_price"] = int(raw_suggested // 5) * 5  # Round down to nearest 5
-                else:
-                    it["suggested_starting_price"] = None
-
-            return {"profile_id": profile_id, "items": items.data}
+            await hydrate_items(items.data, include_images, include_comps)
+            return maybe_fast_json({"profile_id": profile_id, "items": items.data}, request)
         
         except httpx.ReadError as e:
             raise HTTPException(503, "Database connection timeout. Please try again.")
@@ -540,18 +898,93 @@ def list_items(auction_id: str = None, profile_id: str = None):
     else:
         raise HTTPException(400, "Must provide either auction_id or profile_id")
 
+
+ITEMS_PAGE_SIZE = int(os.getenv("ITEMS_PAGE_SIZE", "100"))  # default page for GET /items?profile_id=&limit=
+ITEMS_MAX_PAGE_SIZE = int(os.getenv("ITEMS_MAX_PAGE_SIZE", "1000"))
+ITEMS_STREAM_CHUNK = int(os.getenv("ITEMS_STREAM_CHUNK", "200"))  # items fetched and hydrated per NDJSON chunk
+
+
+async def profile_items_page(auction_ids: list, page_size: int, after: str = None):
+    """One page of a profile's items, keyset-paginated on (created_at desc, item_id desc)"""
+    query = async_db.table("items").select("*").in_("auction_id", auction_ids)
+    if after:
+        created_at, item_id = decode_item_key(after)
+        query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",item_id.lt.{item_id})')
+    # fetch one extra row to know whether another page exists
+    res = await query.order("created_at", desc=True).order("item_id", desc=True).limit(page_size + 1).execute()
+    rows = res.data or []
+    next_after = encode_item_key(rows[page_size - 1]) if len(rows) > page_size else None
+    return rows[:page_size], next_after
+
+
+async def stream_profile_items(auction_ids: list, include_images: bool, include_comps: bool):
+    """NDJSON lines for every item, one hydrated chunk in memory at a time"""
+    after = None
+    while True:
+        page, after = await profile_items_page(auction_ids, ITEMS_STREAM_CHUNK, after)
+        await hydrate_items(page, include_images, include_comps)
+        yield b"".join(dumps(item) + b"\n" for item in page)
+        if after is None:
+            return
+
+
+def encode_item_key(item: dict) -> str:
+    """Opaque keyset position for an item row"""
+    return base64.urlsafe_b64encode(f"{item['created_at']}|{item['item_id']}".encode()).decode()
+
+
+def decode_item_key(key: str):
+    try:
+        created_at, item_id = base64.urlsafe_b64decode(key.encode()).decode().split("|", 1)
+        item_id = str(uuid.UUID(item_id))
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(400, "Invalid after cursor")
+    # the values are spliced into a PostgREST filter, so reject anything that isn't a timestamp
+    if parse_timestamp(created_at) is None:
+        raise HTTPException(400, "Invalid after cursor")
+    return created_at, item_id
+
+
+async def hydrate_items(items: list, include_images: bool = True, include_comps: bool = True):
+    """Attach images, comps, price stats and suggested_starting_price to item rows (fetched concurrently)"""
+    item_ids = [it["item_id"] for it in items]
+    images, comps, prices = await asyncio.gather(
+        async_db.select_in("item_images", "item_id", item_ids) if include_images else asyncio.sleep(0, None),
+        async_db.select_in("comps", "item_id", item_ids) if include_comps else asyncio.sleep(0, None),
+        pricing_stats.get_many(item_ids),
+    )
+    grouped_images = group_by(images or [], "item_id")
+    grouped_comps = group_by(comps or [], "item_id")
+
+    for it in items:
+        if include_images:
+            it["images"] = grouped_images.get(it["item_id"], [])
+        if include_comps:
+            it["comps"] = grouped_comps.get(it["item_id"], [])
+        stats = prices.get(it["item_id"])
+        it["price_stats"] = stats
+        it["suggested_starting_price"] = stats["suggested_starting_price"] if stats else None
+    return items
+
+
+def group_by(rows: list, key: str) -> dict:
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row[key], []).append(row)
+    return grouped
+
 # GET single item by id
 @app.get("/items/{item_id}")
-def get_item(item_id: str):
-    # find item
-    item = supabase.table("items").select("*").eq("item_id", item_id).execute()
-    if not item.data:
+async def get_item(item_id: str):
+    # find item and its images concurrently (entity cache)
+    item_data, images = await asyncio.gather(
+        entity_cache.item_async(item_id),
+        entity_cache.item_images_async(item_id),
+    )
+    if item_data is None:
         raise HTTPException(404, "Item not found")
 
-    # get images
-    imgs = supabase.table("item_images").select("*").eq("item_id", item_id).execute()
-    item_data = item.data[0]
-    item_data["images"] = imgs.data if imgs.data else []
+    item_data["images"] = images
 
     return item_data
 
@@ -566,8 +999,7 @@ def update_item(
     ai_description: str = None
 ):
     # check item exists
-    item = supabase.table("items").select("item_id").eq("item_id", item_id).execute()
-    if not item.data:
+    if entity_cache.item(item_id) is None:
         raise HTTPException(404, "Item not found")
 
     # build update dict
@@ -590,11 +1022,17 @@ def update_item(
     res = supabase.table("items").update(updates).eq("item_id", item_id).execute()
     if not res.data:
         raise HTTPException(500, "Failed to update item")
+    note_auction_change(res.data[0].get("auction_id"), {"type": "item", "item": res.data[0]})
     return res.data[0]
 
 # delete item and related data
 @app.delete("/items/{item_id}")
 def delete_item(item_id: str):
+    auction_id = change_log.auction_for_item(item_id)
+    # bids the engine accepted for this item must land before their item goes
+    bid_engine.invalidate(item_id)
+    if BID_ENGINE_ENABLED and not bid_engine.wait_flushed():
+        raise HTTPException(503, "Bid engine has unflushed bids, retry shortly")
     try:
         # try rpc function first
         result = supabase.rpc('delete_item_cascade', {'p_item_id': item_id}).execute()
@@ -602,6 +1040,8 @@ def delete_item(item_id: str):
         if result.data is None or (isinstance(result.data, list) and len(result.data) == 0):
             raise HTTPException(404, "Item not found")
         
+        pricing_stats.forget([item_id])
+        note_auction_change(auction_id, {"type": "item_deleted", "item_id": item_id})
         return {"message": "Item deleted successfully", "item_id": item_id}
     
     except HTTPException:
@@ -616,10 +1056,67 @@ def delete_item(item_id: str):
             if not item_result.data:
                 raise HTTPException(404, "Item not found")
             
+            pricing_stats.forget([item_id])
+            note_auction_change(auction_id, {"type": "item_deleted", "item_id": item_id})
             return {"message": "Item deleted successfully", "item_id": item_id}
         except Exception as fallback_error:
             raise HTTPException(500, f"Failed to delete item: {str(fallback_error)}")
 
+class ReorderImagesRequest(BaseModel):
+    image_ids: List[int]  # every image of the item, in the desired order (first = primary)
+
+# REORDER item images (must be before /items/{item_id}/images/{image_id} to avoid route conflict)
+@app.put("/items/{item_id}/images/order")
+def reorder_images(item_id: str, request: ReorderImagesRequest):
+    """Set the position of every image of an item in one write (position = index in image_ids + 1)"""
+    if entity_cache.item(item_id) is None:
+        raise HTTPException(404, "Item not found")
+    images = current_item_images(item_id)
+    if not images:
+        raise HTTPException(404, "No images found for this item")
+    if sorted(request.image_ids) != sorted(img["image_id"] for img in images):
+        raise HTTPException(400, "image_ids must list every image of the item exactly once")
+
+    reordered = reorder_item_images(item_id, request.image_ids)
+    return {"message": "Images reordered", "images": reordered}
+
+
+def current_item_images(item_id: str) -> list:
+    """Image rows of an item ordered by position, read from the table (not the entity cache)"""
+    # writes that depend on the full set of images can't trust a cached list:
+    # images added through another instance would be missed
+    res = supabase.table("item_images").select("*").eq("item_id", item_id).order("position").execute()
+    return res.data or []
+
+
+def reorder_item_images(item_id: str, image_ids: list) -> list:
+    """Write the new positions in one round trip; returns the images in their new order"""
+    try:
+        res = supabase.rpc("reorder_item_images", {"p_item_id": item_id, "p_image_ids": image_ids}).execute()
+        reordered = res.data or []
+    except APIError as e:
+        if e.code == "22023":
+            # the item's images changed since they were read
+            raise HTTPException(400, "image_ids must list every image of the item exactly once")
+        if e.code != "PGRST202":
+            raise HTTPException(500, f"Failed to reorder images: {e.message}")
+        # function not deployed yet - like the RPC, move every image to a negative
+        # position first so a unique (item_id, position) never sees a duplicate,
+        # then write the final positions
+        # only the position columns, so a concurrent url update isn't overwritten
+        rows = [{"image_id": image_id, "item_id": item_id, "position": position}
+                for position, image_id in enumerate(image_ids, start=1)]
+        try:
+            supabase.table("item_images").upsert(
+                [{**row, "position": -row["position"]} for row in rows], on_conflict="image_id"
+            ).execute()
+            reordered = supabase.table("item_images").upsert(rows, on_conflict="image_id").execute().data or rows
+        except APIError as e:
+            raise HTTPException(500, f"Failed to reorder images: {e.message}")
+    note_item_change(item_id, {"type": "reset", "item_id": item_id})
+    return sorted(reordered, key=lambda img: img["position"])
+
+
 # UPDATE item image URL
 @app.put("/items/{item_id}/images/{image_id}")
 def update_item_image(item_id: str, image_id: int, url: str):
@@ -628,8 +1125,7 @@ def update_item_image(item_id: str, image_id: int, url: str):
     Used after uploading image to Supabase Storage.
     """
     # Verify item exists
-    item = supabase.table("items").select("item_id").eq("item_id", item_id).execute()
-    if not item.data:
+    if entity_cache.item(item_id) is None:
         raise HTTPException(404, "Item not found")
     
     # Update the image URL
@@ -637,6 +1133,7 @@ def update_item_image(item_id: str, image_id: int, url: str):
     if not res.data:
         raise HTTPException(500, "Failed to update image URL")
     
+    note_item_change(item_id, {"type": "reset", "item_id": item_id})
     return {"message": "Image URL updated successfully", "image": res.data[0]}
 
 
@@ -651,13 +1148,15 @@ def add_item_images(item_id: str, request: AddItemImagesRequest):
     Used after uploading images to Supabase Storage.
     """
     # Verify item exists
-    item = supabase.table("items").select("item_id").eq("item_id", item_id).execute()
-    if not item.data:
+    if entity_cache.item(item_id) is None:
         raise HTTPException(404, "Item not found")
     
-    # Get current highest position for this item
-    existing = supabase.table("item_images").select("position").eq("item_id", item_id).order("position", desc=True).limit(1).execute()
-    next_position = (existing.data[0]["position"] + 1) if existing.data else 1
+    # Get current highest position for this item (from the table, the cache may
+    # not have images added through another instance)
+    last = supabase.table("item_images").select("position").eq("item_id", item_id).order(
+        "position", desc=True
+    ).limit(1).execute()
+    next_position = (last.data[0]["position"] + 1) if last.data else 1
     
     # Insert new images with sequential positions
     rows = []
@@ -672,6 +1171,7 @@ def add_item_images(item_id: str, request: AddItemImagesRequest):
         res = supabase.table("item_images").insert(rows).execute()
         if not res.data:
             raise HTTPException(500, "Failed to add images")
+        note_item_change(item_id, {"type": "reset", "item_id": item_id})
         return {"message": f"Added {len(rows)} images", "images": res.data}
     
     return {"message": "No images to add", "images": []}
@@ -682,21 +1182,20 @@ def add_item_images(item_id: str, request: AddItemImagesRequest):
 def set_image_primary(item_id: str, image_id: int):
     """
     Set an image as the primary image for an item.
-    Moves the selected image to position 1 and shifts others accordingly.
+    Moves the selected image to position 1 and shifts others accordingly (one reorder write).
     """
     # Verify item exists
-    item = supabase.table("items").select("item_id").eq("item_id", item_id).execute()
-    if not item.data:
+    if entity_cache.item(item_id) is None:
         raise HTTPException(404, "Item not found")
     
     # Get all images for this item
-    images = supabase.table("item_images").select("*").eq("item_id", item_id).order("position").execute()
-    if not images.data:
+    images = current_item_images(item_id)
+    if not images:
         raise HTTPException(404, "No images found for this item")
     
     # Find the target image
     target_image = None
-    for img in images.data:
+    for img in images:
         if img["image_id"] == image_id:
             target_image = img
             break
@@ -708,39 +1207,31 @@ def set_image_primary(item_id: str, image_id: int):
     if target_image["position"] == 1:
         return {"message": "Image is already primary", "image": target_image}
     
-    # Reorder: set target to position 1, shift others down
-    # First, set target to position 0 (temporary)
-    supabase.table("item_images").update({"position": 0}).eq("image_id", image_id).execute()
+    # Move the target to the front, keeping the others in their current order
+    order = [image_id] + [img["image_id"] for img in images if img["image_id"] != image_id]
+    reordered = reorder_item_images(item_id, order)
     
-    # Increment positions of all images that were before the target
-    for img in images.data:
-        if img["image_id"] != image_id and img["position"] < target_image["position"]:
-            supabase.table("item_images").update({"position": img["position"] + 1}).eq("image_id", img["image_id"]).execute()
-    
-    # Set target to position 1
-    res = supabase.table("item_images").update({"position": 1}).eq("image_id", image_id).execute()
-    
-    return {"message": "Image set as primary", "image": res.data[0] if res.data else target_image}
+    return {"message": "Image set as primary", "image": reordered[0] if reordered else target_image}
 
 
 # comps endpoints
 
 # get saved comps for item
 @app.get("/items/{item_id}/comps/saved")
-def get_saved_comps(item_id: str):
+async def get_saved_comps(item_id: str):
     """
     Retrieve previously saved comps from the database for an item.
     This is useful when the scraper is rate-limited or unavailable.
     """
     try:
-        # Verify item exists
-        item = supabase.table("items").select("item_id").eq("item_id", item_id).execute()
-        if not item.data:
+        # Verify item exists and get saved comps from database concurrently
+        item, comps = await asyncio.gather(
+            entity_cache.item_async(item_id),
+            async_db.table("comps").select("*").eq("item_id", item_id).order("created_at", desc=True).execute(),
+        )
+        if item is None:
             raise HTTPException(404, "Item not found")
         
-        # Get saved comps from database
-        comps = supabase.table("comps").select("*").eq("item_id", item_id).order("created_at", desc=True).execute()
-        
         if not comps.data:
             return {
                 "item_id": item_id,
@@ -1120,6 +1611,8 @@ You must output exactly THREE comps from 2025, filling every field:
                     except Exception as e:
                         pass
         
+        await asyncio.to_thread(pricing_stats.refresh, [request.item_id])
+        
         return {
             "success": True,
             "item_id": request.item_id,
@@ -1135,36 +1628,29 @@ You must output exactly THREE comps from 2025, filling every field:
 
 
 @app.get("/comps/{item_id}")
-def get_comps_for_item(item_id: str):
+async def get_comps_for_item(item_id: str):
     """
     Get all saved comps for a specific item
     """
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            # Verify item exists
-            item = supabase.table("items").select("item_id").eq("item_id", item_id).execute()
-            if not item.data:
-                raise HTTPException(404, "Item not found")
-            
-            # Get all comps for this item
-            comps = supabase.table("comps").select("*").eq("item_id", item_id).order("created_at", desc=True).execute()
-            
-            return {
-                "item_id": item_id,
-                "comps": comps.data if comps.data else []
-            }
+    try:
+        # Verify item exists and get all comps for this item concurrently
+        # (async_db retries transient connection errors itself)
+        item, comps = await asyncio.gather(
+            entity_cache.item_async(item_id),
+            async_db.table("comps").select("*").eq("item_id", item_id).order("created_at", desc=True).execute(),
+        )
+        if item is None:
+            raise HTTPException(404, "Item not found")
         
-        except httpx.ReadError as e:
-            if attempt < max_retries - 1:
-                import time
-                time.sleep(0.5)
-            else:
-                raise HTTPException(503, "Database connection timeout. Please try again.")
-        except HTTPException:
-            raise
-        except Exception as e:
-            raise HTTPException(500, f"Failed to retrieve comps: {str(e)}")
+        return {
+            "item_id": item_id,
+            "comps": comps.data if comps.data else []
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, f"Failed to retrieve comps: {str(e)}")
 
 
 # ============================================
@@ -1215,6 +1701,8 @@ class BidRequest(BaseModel):
     bidder_email: str
     bidder_name: str
     bid_amount: float
+    expected_current_bid: Optional[float] = None  # highest bid the client saw; enables stale-bid detection
+    max_bid: Optional[float] = None  # proxy bidding: server raises this bid as needed up to max_bid
 
 class BuyNowRequest(BaseModel):
     """Request model for buy now purchase"""
@@ -1309,6 +1797,1986 @@ async def create_comps_batch(request: BatchCompsRequest):
         raise HTTPException(500, f"Failed to process batch: {str(e)}")
 
 
+# ============================================
+# BID SUMMARIES
+# ============================================
+# Highest bid, bid count and last bid time per item, loaded in one batched
+# query the first time an item is read and kept current as bids are accepted.
+# Entries expire after BID_SUMMARY_TTL seconds so bids taken by other processes
+# show up, and at most BID_SUMMARY_CACHE_SIZE items are kept.
+
+IN_FILTER_CHUNK = 200  # ids per .in_() filter, keeps PostgREST URLs a sane length
+BID_SUMMARY_CACHE_SIZE = int(os.getenv("BID_SUMMARY_CACHE_SIZE", "50000"))  # items kept
+BID_SUMMARY_TTL = float(os.getenv("BID_SUMMARY_TTL", "30"))  # seconds
+
+
+def chunked(values: list, size: int = IN_FILTER_CHUNK):
+    """Split a list into consecutive chunks of at most `size` values"""
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class BidSummaryStore:
+    """Per-item bid summaries maintained incrementally from accepted bids"""
+
+    def __init__(self, max_entries: int = BID_SUMMARY_CACHE_SIZE, ttl: float = BID_SUMMARY_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.summaries = OrderedDict()  # item_id -> (expires_at, {"highest_bid", "bid_count", "last_bid_at"})
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def empty():
+        return {"highest_bid": None, "bid_count": 0, "last_bid_at": None}
+
+    def get_many(self, item_ids: list) -> dict:
+        """Summaries for the given items; unknown or expired items are loaded in batched queries"""
+        now = time.monotonic()
+        result, missing = {}, []
+        with self.lock:
+            for iid in item_ids:
+                entry = self.summaries.get(iid)
+                if entry is not None and entry[0] > now:
+                    self.summaries.move_to_end(iid)
+                    result[iid] = dict(entry[1])
+                else:
+                    missing.append(iid)
+        if missing:
+            loaded = self._load(missing)
+            with self.lock:
+                for iid in missing:
+                    summary = loaded.get(iid, self.empty())
+                    entry = self.summaries.get(iid)
+                    if entry is not None:
+                        # bids recorded here may not be written yet: never go backwards
+                        summary = self._merge(summary, entry[1])
+                    self.summaries[iid] = (time.monotonic() + self.ttl, summary)
+                    self.summaries.move_to_end(iid)
+                    result[iid] = dict(summary)
+                while len(self.summaries) > self.max_entries:
+                    self.summaries.popitem(last=False)
+        return result
+
+    def _load(self, item_ids: list) -> dict:
+        loaded = {}
+        try:
+            # one row per item, so chunks stay under PostgREST's row limit
+            for chunk in chunked(item_ids):
+                res = supabase.rpc("bid_summaries", {"p_item_ids": chunk}).execute()
+                for row in res.data or []:
+                    loaded[row["item_id"]] = {
+                        "highest_bid": row["highest_bid"],
+                        "bid_count": row["bid_count"],
+                        "last_bid_at": row["last_bid_at"],
+                    }
+            return loaded
+        except APIError as e:
+            if e.code != "PGRST202":
+                raise
+        # function not deployed yet - aggregate a narrow projection in Python, page by page
+        loaded = {}
+        for chunk in chunked(item_ids):
+            bids = iter_pages(lambda: supabase.table("bids").select("bid_id, item_id, amount, created_at").in_("item_id", chunk).order("bid_id"))
+            for row in bids:
+                summary = loaded.setdefault(row["item_id"], self.empty())
+                self._apply(summary, row["amount"], row.get("created_at"))
+        return loaded
+
+    @staticmethod
+    def _apply(summary: dict, amount, created_at):
+        summary["bid_count"] += 1
+        if summary["highest_bid"] is None or amount > summary["highest_bid"]:
+            summary["highest_bid"] = amount
+        if created_at and (summary["last_bid_at"] is None or created_at > summary["last_bid_at"]):
+            summary["last_bid_at"] = created_at
+
+    @staticmethod
+    def _merge(loaded: dict, cached: dict) -> dict:
+        merged = dict(loaded)
+        merged["bid_count"] = max(loaded["bid_count"], cached["bid_count"])
+        for key in ("highest_bid", "last_bid_at"):
+            if cached[key] is not None and (merged[key] is None or cached[key] > merged[key]):
+                merged[key] = cached[key]
+        return merged
+
+    def record(self, item_id: str, amount, created_at):
+        """Fold an accepted bid into the item's summary (no-op until the item is loaded)"""
+        with self.lock:
+            entry = self.summaries.get(item_id)
+            if entry is not None:
+                self._apply(entry[1], amount, created_at)
+
+    def forget(self, item_ids):
+        with self.lock:
+            for iid in item_ids:
+                self.summaries.pop(iid, None)
+
+
+bid_summaries = BidSummaryStore()
+
+
+# ============================================
+# PRICING STATISTICS
+# ============================================
+# Per-item price statistics over an item's comps (median, trimmed mean,
+# percentile band and an outlier-filtered estimate that suggested_starting_price
+# is derived from). They are recomputed when comps are saved, persisted to the
+# item_price_stats table (sql/item_price_stats.sql) and cached here, so listing
+# reads are lookups. Recomputation is vectorized across all requested items
+# with NumPy when it is installed, with a pure Python fallback. Cached entries
+# expire after PRICING_STATS_TTL so comps saved through another instance show up.
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PRICE_TRIM = 0.1  # fraction trimmed from each end for the trimmed mean
+PRICE_OUTLIER_K = 3.0  # comps further than K robust deviations from the median are ignored
+PRICE_MIN_SPREAD = 0.25  # robust deviation floor, as a fraction of the median
+PRICE_START_RATIO = 0.8  # suggested starting price = estimate * ratio, rounded down to 5
+PRICING_STATS_TTL = float(os.getenv("PRICING_STATS_TTL", "300"))  # seconds
+MISSING_TABLE_CODES = ("PGRST205", "42P01")  # table not in the schema cache / undefined table
+
+
+def _price_stats_row(item_id, count, mean, median, trimmed, p25, p75, estimate) -> dict:
+    return {
+        "item_id": item_id,
+        "comp_count": int(count),
+        "mean": round(float(mean), 2),
+        "median": round(float(median), 2),
+        "trimmed_mean": round(float(trimmed), 2),
+        "p25": round(float(p25), 2),
+        "p75": round(float(p75), 2),
+        "estimate": round(float(estimate), 2),
+        "suggested_starting_price": int(float(estimate) * PRICE_START_RATIO // 5) * 5,
+    }
+
+
+def compute_price_stats(prices_by_item: dict) -> dict:
+    """item_id -> price stats for every item with at least one positive comp price"""
+    prices_by_item = {
+        item_id: [float(p) for p in prices if p is not None and float(p) > 0]
+        for item_id, prices in prices_by_item.items()
+    }
+    item_ids = [item_id for item_id, prices in prices_by_item.items() if prices]
+    if not item_ids:
+        return {}
+    if np is None:
+        return {item_id: _price_stats_python(item_id, prices_by_item[item_id]) for item_id in item_ids}
+
+    # one NaN-padded row per item, sorted so the NaN padding sits at the end
+    width = max(len(prices_by_item[item_id]) for item_id in item_ids)
+    grid = np.full((len(item_ids), width), np.nan)
+    for row, item_id in enumerate(item_ids):
+        prices = prices_by_item[item_id]
+        grid[row, :len(prices)] = prices
+    grid.sort(axis=1)
+    counts = np.sum(~np.isnan(grid), axis=1)
+
+    mean = np.nanmean(grid, axis=1)
+    median = np.nanmedian(grid, axis=1)
+    p25, p75 = np.nanpercentile(grid, [25, 75], axis=1)
+
+    positions = np.arange(width)
+    trim = np.floor(counts * PRICE_TRIM).astype(int)
+    kept = (positions >= trim[:, None]) & (positions < (counts - trim)[:, None])
+    trimmed = np.where(kept, grid, 0).sum(axis=1) / kept.sum(axis=1)
+
+    deviation = np.abs(grid - median[:, None])
+    scale = np.maximum(1.4826 * np.nanmedian(deviation, axis=1), PRICE_MIN_SPREAD * median)
+    with np.errstate(invalid="ignore"):
+        inliers = deviation <= PRICE_OUTLIER_K * scale[:, None]
+    inlier_counts = inliers.sum(axis=1)
+    estimate = np.where(
+        inlier_counts > 0,
+        np.where(inliers, grid, 0).sum(axis=1) / np.maximum(inlier_counts, 1),
+        median,
+    )
+
+    return {
+        item_id: _price_stats_row(item_id, counts[i], mean[i], median[i], trimmed[i], p25[i], p75[i], estimate[i])
+        for i, item_id in enumerate(item_ids)
+    }
+
+
+def _percentile(ordered: list, q: float) -> float:
+    # linear interpolation between closest ranks, as numpy's default
+    position = (len(ordered) - 1) * q
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def _price_stats_python(item_id: str, prices: list) -> dict:
+    ordered = sorted(prices)
+    count = len(ordered)
+    median = _percentile(ordered, 0.5)
+    trim = int(count * PRICE_TRIM)
+    kept = ordered[trim:count - trim]
+    deviations = sorted(abs(p - median) for p in ordered)
+    scale = max(1.4826 * _percentile(deviations, 0.5), PRICE_MIN_SPREAD * median)
+    inliers = [p for p in ordered if abs(p - median) <= PRICE_OUTLIER_K * scale]
+    estimate = sum(inliers) / len(inliers) if inliers else median
+    return _price_stats_row(
+        item_id, count, sum(ordered) / count, median, sum(kept) / len(kept),
+        _percentile(ordered, 0.25), _percentile(ordered, 0.75), estimate
+    )
+
+
+class PricingStatsStore:
+    """Cached per-item price stats backed by the item_price_stats table"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.stats = {}  # item_id -> (expires_at, stats dict or None for items without comps)
+        self.lock = threading.Lock()
+        self.persist = True  # turned off if the item_price_stats table is missing
+
+    async def get_many(self, item_ids: list) -> dict:
+        """Stats for each item (None without comps): cache, then table, then computed from comps"""
+        now = time.monotonic()
+        with self.lock:
+            found = {}
+            for iid in item_ids:
+                entry = self.stats.get(iid)
+                if entry is not None and entry[0] > now:
+                    found[iid] = entry[1]
+        missing = [iid for iid in item_ids if iid not in found]
+        if missing and self.persist:
+            try:
+                rows = await async_db.select_in("item_price_stats", "item_id", missing)
+            except APIError as e:
+                self._unavailable(e)
+                rows = []
+            for row in rows:
+                found[row["item_id"]] = row
+            missing = [iid for iid in missing if iid not in found]
+        if missing:
+            comps = await async_db.select_in("comps", "item_id", missing, "item_id, sold_price")
+            computed = compute_price_stats(self._prices(missing, comps))
+            await asyncio.to_thread(self._save, list(computed.values()))
+            for iid in missing:
+                found[iid] = computed.get(iid)
+        expires_at = time.monotonic() + self.ttl
+        with self.lock:
+            for iid in item_ids:
+                entry = self.stats.get(iid)
+                if entry is None or entry[0] <= now:
+                    self.stats[iid] = (expires_at, found[iid])
+        return found
+
+    def refresh(self, item_ids: list) -> dict:
+        """Recompute stats for items from their current comps (call after comps change)"""
+        comps = []
+        for chunk in chunked(item_ids):
+            res = supabase.table("comps").select("item_id, sold_price").in_("item_id", chunk).execute()
+            comps.extend(res.data or [])
+        computed = compute_price_stats(self._prices(item_ids, comps))
+        self._save(list(computed.values()))
+        stale = [iid for iid in item_ids if iid not in computed]
+        if stale and self.persist:
+            for chunk in chunked(stale):
+                supabase.table("item_price_stats").delete().in_("item_id", chunk).execute()
+        expires_at = time.monotonic() + self.ttl
+        with self.lock:
+            for iid in item_ids:
+                self.stats[iid] = (expires_at, computed.get(iid))
+        return computed
+
+    def refresh_auction(self, auction_id: str) -> dict:
+        items = supabase.table("items").select("item_id").eq("auction_id", auction_id).execute()
+        return self.refresh([item["item_id"] for item in items.data or []])
+
+    def forget(self, item_ids):
+        with self.lock:
+            for iid in item_ids:
+                self.stats.pop(iid, None)
+
+    @staticmethod
+    def _prices(item_ids: list, comps: list) -> dict:
+        prices = {iid: [] for iid in item_ids}
+        for comp in comps:
+            prices[comp["item_id"]].append(comp.get("sold_price"))
+        return prices
+
+    def _save(self, rows: list):
+        if not rows or not self.persist:
+            return
+        updated_at = datetime.now(timezone.utc).isoformat()
+        try:
+            for chunk in chunked(rows):
+                supabase.table("item_price_stats").upsert(
+                    [{**row, "updated_at": updated_at} for row in chunk], on_conflict="item_id"
+                ).execute()
+        except APIError as e:
+            self._unavailable(e)
+
+    def _unavailable(self, e: APIError):
+        if e.code in MISSING_TABLE_CODES:
+            # table not created yet - keep the stats in memory only
+            logger.warning("item_price_stats unavailable, pricing stats are not persisted: %s", e.message)
+            self.persist = False
+        else:
+            logger.error("item_price_stats request failed: %s", e.message)
+
+
+pricing_stats = PricingStatsStore(PRICING_STATS_TTL)
+
+
+# ============================================
+# AUCTION CHANGE LOG (DELTA SYNC + ETAGS)
+# ============================================
+# Every write that changes what an auction's bid or public endpoints return is
+# recorded here with a per-auction version number. Clients pass the returned
+# cursor back as ?since= to get only the changes after it, and the version
+# doubles as an ETag so unchanged polls get a 304 without touching Supabase.
+# Versions only see writes made by this process, so cursors force a full fetch
+# and ETags change at least every CHANGE_LOG_MAX_AGE seconds; that bounds how
+# long writes through other instances can go unseen.
+
+CHANGE_LOG_SIZE = int(os.getenv("CHANGE_LOG_SIZE", "1000"))  # changes kept per auction
+CHANGE_LOG_AUCTIONS = int(os.getenv("CHANGE_LOG_AUCTIONS", "500"))  # auctions with a retained log
+CHANGE_LOG_MAX_AGE = float(os.getenv("CHANGE_LOG_MAX_AGE", "10"))  # seconds a cursor or ETag is trusted; 0 = forever
+
+
+class AuctionChangeLog:
+    """Versioned, bounded per-auction change feed"""
+
+    def __init__(self, size: int, max_auctions: int, max_age: float):
+        self.epoch = uuid.uuid4().hex[:8]  # cursors and ETags from another process are never trusted
+        self.size = size
+        self.max_auctions = max_auctions
+        self.max_age = max_age
+        self.versions = {}  # auction_id -> latest version, never evicted
+        self.logs = OrderedDict()  # auction_id -> deque of (version, change), least recently written first
+        self.item_auctions = {}  # item_id -> auction_id
+        self.lock = threading.Lock()
+
+    def record(self, auction_id: str, change: dict):
+        """Append a change; {"type": "reset"} forces clients back to a full fetch"""
+        if not auction_id:
+            return
+        with self.lock:
+            version = self.versions.get(auction_id, 0) + 1
+            self.versions[auction_id] = version
+            log = self.logs.pop(auction_id, None) or deque(maxlen=self.size)
+            log.append((version, change))
+            self.logs[auction_id] = log
+            while len(self.logs) > self.max_auctions:
+                self.logs.popitem(last=False)
+
+    def version(self, auction_id: str) -> int:
+        return self.versions.get(auction_id, 0)
+
+    def cursor(self, auction_id: str) -> str:
+        """Cursor for a full fetch made now"""
+        return f"{self.epoch}.{self.version(auction_id)}.{int(time.time())}"
+
+    def etag(self, auction_id: str, variant: str = "") -> str:
+        # the time bucket expires 304s for writes this process never saw
+        bucket = int(time.time() // self.max_age) if self.max_age > 0 else 0
+        return f'W/"{self.epoch}-{auction_id}-{self.version(auction_id)}-{bucket}{"-" + variant if variant else ""}"'
+
+    def since(self, auction_id: str, cursor: str):
+        """
+        (changes after `cursor`, new cursor). changes is None when the client
+        must do a full fetch: unknown epoch, cursor too old, a reset in between,
+        or the client's last full fetch is more than max_age seconds old.
+        Cursors carry the time of that full fetch, so deltas cannot extend it.
+        """
+        parts = (cursor or "").split(".")
+        now = int(time.time())
+        with self.lock:
+            current = self.versions.get(auction_id, 0)
+            full_cursor = f"{self.epoch}.{current}.{now}"
+            if len(parts) != 3 or parts[0] != self.epoch or not parts[1].isdigit() or not parts[2].isdigit():
+                return None, full_cursor
+            after, full_at = int(parts[1]), int(parts[2])
+            if after > current or (self.max_age > 0 and now - full_at > self.max_age):
+                return None, full_cursor
+            new_cursor = f"{self.epoch}.{current}.{full_at}"
+            if after == current:
+                return [], new_cursor
+            log = self.logs.get(auction_id)
+            # the oldest retained change must directly follow the cursor
+            if not log or log[0][0] > after + 1:
+                return None, full_cursor
+            changes = [change for version, change in log if version > after]
+        if any(change["type"] == "reset" for change in changes):
+            return None, full_cursor
+        return changes, new_cursor
+
+    def remember_item(self, item_id: str, auction_id: str):
+        if item_id and auction_id:
+            self.item_auctions[item_id] = auction_id
+
+    def auction_for_item(self, item_id: str):
+        """auction_id owning an item (one lookup query the first time)"""
+        auction_id = self.item_auctions.get(item_id)
+        if auction_id is None:
+            item = supabase.table("items").select("auction_id").eq("item_id", item_id).execute()
+            if item.data:
+                auction_id = item.data[0]["auction_id"]
+                self.item_auctions[item_id] = auction_id
+        return auction_id
+
+
+change_log = AuctionChangeLog(CHANGE_LOG_SIZE, CHANGE_LOG_AUCTIONS, CHANGE_LOG_MAX_AGE)
+
+
+def note_auction_change(auction_id: str, change: dict):
+    """Single hook for every write that changes an auction's bids, items, images or settings"""
+    change_log.record(auction_id, change)
+    public_auction_cache.invalidate(auction_id)
+    entity_cache.apply(auction_id, change)
+
+
+def note_item_change(item_id: str, change: dict):
+    """Same as note_auction_change for writes that only know the item"""
+    note_auction_change(change_log.auction_for_item(item_id), change)
+
+
+def public_changes(changes: list) -> list:
+    """Changes safe for public viewers: unlisted items show up only as removals, bids anonymously"""
+    visible = []
+    for change in changes:
+        item = change.get("item")
+        if item is not None and not item.get("is_listed"):
+            visible.append({"type": "item_removed", "item_id": item["item_id"]})
+        elif change["type"] == "bid":
+            visible.append({**change, "bid": anonymous_bid(change["bid"])})
+        else:
+            visible.append(change)
+    return visible
+
+
+def not_modified(request: Request, response: Response, auction_id: str, variant: str = ""):
+    """Set the ETag header; return a 304 response if the client already has this version"""
+    etag = change_log.etag(auction_id, variant)
+    response.headers["ETag"] = etag
+    client_etags = [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]
+    if etag in client_etags:
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+
+# ============================================
+# FAST JSON + RESPONSE COMPRESSION
+# ============================================
+# Large listing payloads skip FastAPI's jsonable_encoder: they are serialized
+# once (with orjson when FAST_JSON=true and it is installed) and compressed
+# with brotli or gzip per Accept-Encoding. Compressed variants are kept on the
+# EncodedPayload, so cached and coalesced payloads are compressed only once.
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+FAST_JSON = os.getenv("FAST_JSON", "").lower() in ("1", "true", "yes")
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))  # bytes; smaller bodies go out as-is
+
+
+def dumps(payload) -> bytes:
+    """Serialize a response payload to JSON bytes"""
+    if FAST_JSON and orjson is not None:
+        return orjson.dumps(payload, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=str).encode()
+
+
+class EncodedPayload:
+    """Serialized JSON body plus lazily built compressed variants, safe to share across requests"""
+    __slots__ = ("body", "variants")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.variants = {}  # content-encoding -> bytes
+
+    def encoded(self, encoding):
+        if encoding is None:
+            return self.body
+        data = self.variants.get(encoding)
+        if data is None:
+            if encoding == "br":
+                data = brotli.compress(self.body, quality=5)
+            else:
+                data = gzip.compress(self.body, compresslevel=6)
+            self.variants[encoding] = data
+        return data
+
+
+def negotiate_encoding(request: Request, size: int):
+    """Best content-encoding the client accepts: br, then gzip, else None"""
+    if size < COMPRESS_MIN_SIZE:
+        return None
+    accepted = set()
+    for part in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.add(name.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def payload_response(payload: EncodedPayload, request: Request, headers: dict = None) -> Response:
+    """Response for a pre-serialized payload, compressed as negotiated"""
+    encoding = negotiate_encoding(request, len(payload.body))
+    headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=payload.encoded(encoding), media_type="application/json", headers=headers)
+
+
+def maybe_fast_json(payload: dict, request: Request):
+    """With FAST_JSON, serialize and compress directly instead of returning the dict to FastAPI"""
+    if not FAST_JSON:
+        return payload
+    return payload_response(EncodedPayload(dumps(payload)), request)
+
+
+# ============================================
+# REQUEST COALESCING (SINGLE-FLIGHT)
+# ============================================
+# Concurrent identical reads share one in-flight backend fetch and its result,
+# flattening the thundering herd on hot endpoints at auction close.
+# Shared results are handed to every caller, so they must not be mutated.
+
+class _Flight:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Run at most one fetch per key at a time; callers that arrive meanwhile wait for its result"""
+
+    def __init__(self):
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.metrics = {}  # endpoint -> {"fetches", "requests", "max_served"}
+
+    def do(self, key: tuple, fetch):
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = _Flight()
+            else:
+                flight.waiters += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = fetch()
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+                served = flight.waiters + 1
+                m = self.metrics.setdefault(key[0], {"fetches": 0, "requests": 0, "max_served": 0})
+                m["fetches"] += 1
+                m["requests"] += served
+                m["max_served"] = max(m["max_served"], served)
+            flight.done.set()
+
+    def stats(self):
+        with self.lock:
+            return {
+                name: {**m, "avg_served": round(m["requests"] / m["fetches"], 2)}
+                for name, m in self.metrics.items()
+            }
+
+
+single_flight = SingleFlight()
+
+
+# ============================================
+# PUBLIC AUCTION PAYLOAD CACHE
+# ============================================
+# GET /auctions/{auction_id}/public is the highest-traffic read and changes far
+# less often than it is requested. The fully serialized response is kept per
+# auction, tagged with the change log version it was built at; any write
+# recorded through note_auction_change drops it. Writes through other
+# instances are not seen here, so entries also expire after PUBLIC_CACHE_TTL.
+
+PUBLIC_CACHE_SIZE = int(os.getenv("PUBLIC_CACHE_SIZE", "200"))  # auctions kept
+PUBLIC_CACHE_TTL = float(os.getenv("PUBLIC_CACHE_TTL", "10"))  # seconds
+
+
+class PublicAuctionCache:
+    """Bounded LRU of serialized public auction payloads, keyed by auction and version"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # auction_id -> (version, expires_at, EncodedPayload)
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "expired": 0, "invalidations": 0}
+
+    def get(self, auction_id: str, version: int):
+        with self.lock:
+            entry = self.entries.get(auction_id)
+            if entry is not None and entry[1] <= time.monotonic():
+                del self.entries[auction_id]
+                self.counters["expired"] += 1
+                entry = None
+            if entry is None or entry[0] != version:
+                self.counters["misses"] += 1
+                return None
+            self.entries.move_to_end(auction_id)
+            self.counters["hits"] += 1
+            return entry[2]
+
+    def put(self, auction_id: str, version: int, body: "EncodedPayload"):
+        # a write that landed while the payload was built bumped the version,
+        # so this entry would never be served - don't store it
+        if change_log.version(auction_id) != version:
+            return
+        with self.lock:
+            self.entries[auction_id] = (version, time.monotonic() + self.ttl, body)
+            self.entries.move_to_end(auction_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, auction_id: str):
+        with self.lock:
+            if self.entries.pop(auction_id, None) is not None:
+                self.counters["invalidations"] += 1
+
+    def stats(self):
+        return {"entries": len(self.entries), **self.counters}
+
+
+public_auction_cache = PublicAuctionCache(PUBLIC_CACHE_SIZE, PUBLIC_CACHE_TTL)
+
+
+# ============================================
+# PROFILE AND OWNERSHIP CACHE
+# ============================================
+# create_item, import_items and create_auction check the owning profile's
+# is_active flag (and create_item the auction's profile_id) on every call.
+# Both are kept in bounded TTL-LRU caches; make_payment, update_user_email and
+# auction create/delete invalidate explicitly, and the TTL bounds staleness
+# from writes made outside this process.
+
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))  # entries per cache
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "60"))  # seconds
+
+
+class TTLCache:
+    """Bounded LRU whose entries also expire ttl seconds after they were stored"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.loading = {}  # key -> token of the load in flight; dropped when the key is invalidated
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key):
+        """Cached value, or None on a miss"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self.entries[key]
+                self.counters["expired"] += 1
+                entry = None
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return entry[1]
+
+    def put(self, key, value, token=None):
+        """Store a value; with a load token, only if the key was not invalidated while loading"""
+        with self.lock:
+            if token is not None:
+                if self.loading.get(key) is not token:
+                    return
+                del self.loading[key]
+            else:
+                self.loading.pop(key, None)  # a write supersedes any load in flight
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def _begin_load(self, key):
+        token = object()
+        with self.lock:
+            self.loading[key] = token
+        return token
+
+    def _end_load(self, key, token, value):
+        if value is not None:
+            self.put(key, value, token)
+        else:
+            with self.lock:
+                if self.loading.get(key) is token:
+                    del self.loading[key]
+
+    def get_or_load(self, key, load):
+        """Cached value, else load() and cache it unless it is None"""
+        value = self.get(key)
+        if value is not None:
+            return value
+        token = self._begin_load(key)
+        value = None
+        try:
+            value = load()
+            return value
+        finally:
+            self._end_load(key, token, value)
+
+    async def get_or_load_async(self, key, load):
+        """get_or_load for a coroutine function"""
+        value = self.get(key)
+        if value is not None:
+            return value
+        token = self._begin_load(key)
+        value = None
+        try:
+            value = await load()
+            return value
+        finally:
+            self._end_load(key, token, value)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.loading.pop(key, None)
+            if self.entries.pop(key, None) is not None:
+                self.counters["invalidations"] += 1
+
+    def invalidate_matching(self, match) -> list:
+        """Drop every entry whose value satisfies match(value) (and any load in flight); returns their keys"""
+        with self.lock:
+            self.loading.clear()
+            keys = [key for key, (_, value) in self.entries.items() if match(value)]
+            for key in keys:
+                del self.entries[key]
+            self.counters["invalidations"] += len(keys)
+            return keys
+
+    def stats(self):
+        return {"entries": len(self.entries), **self.counters}
+
+
+profile_status_cache = TTLCache(PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL)  # profile_id -> is_active
+auction_owner_cache = TTLCache(PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL)  # auction_id -> profile_id
+
+
+def profile_is_active(profile_id: str):
+    """The profile's is_active flag; None if the profile does not exist"""
+    def load():
+        prof = supabase.table("profiles").select("is_active").eq("profile_id", profile_id).execute()
+        return bool(prof.data[0]["is_active"]) if prof.data else None
+    return profile_status_cache.get_or_load(profile_id, load)
+
+
+def auction_owner(auction_id: str):
+    """profile_id of the auction's owner; None if the auction does not exist"""
+    def load():
+        auction = supabase.table("auctions").select("profile_id").eq("auction_id", auction_id).execute()
+        return auction.data[0]["profile_id"] if auction.data else None
+    return auction_owner_cache.get_or_load(auction_id, load)
+
+
+def require_active_owner(auction_id: str) -> str:
+    """404 if the auction does not exist, 403 if its owner is not active; returns the owner's profile_id"""
+    profile_id = auction_owner(auction_id)
+    if profile_id is None:
+        raise HTTPException(404, "Auction not found")
+    if not profile_is_active(profile_id):
+        raise HTTPException(403, "User is not active")
+    return profile_id
+
+
+# ============================================
+# ENTITY CACHE (AUCTIONS, ITEMS, IMAGES)
+# ============================================
+# Auction and item rows by primary key, and each item's image rows, for
+# get_auction / get_item and the "item exists" checks in front of item writes.
+# Every write already goes through note_auction_change, which applies the change
+# here: rows returned by updates are written through, anything else (bids,
+# buy-now, settlement, image edits, resets) drops the affected entries. Only
+# found rows are cached; the TTL bounds staleness from writes made elsewhere.
+
+ENTITY_CACHE_SIZE = int(os.getenv("ENTITY_CACHE_SIZE", "5000"))  # rows per entity type
+ENTITY_CACHE_TTL = float(os.getenv("ENTITY_CACHE_TTL", "300"))  # seconds
+
+
+class EntityCache:
+    """Process-local auctions, items and per-item image lists; callers get copies"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.auctions = TTLCache(max_entries, ttl)  # auction_id -> row
+        self.items = TTLCache(max_entries, ttl)  # item_id -> row
+        self.images = TTLCache(max_entries, ttl)  # item_id -> image rows by position
+
+    def auction(self, auction_id: str):
+        """Auction row, or None if it does not exist"""
+        def load():
+            res = supabase.table("auctions").select("*").eq("auction_id", auction_id).execute()
+            return res.data[0] if res.data else None
+        return _copy_row(self.auctions.get_or_load(auction_id, load))
+
+    async def auction_async(self, auction_id: str):
+        async def load():
+            res = await async_db.table("auctions").select("*").eq("auction_id", auction_id).execute()
+            return res.data[0] if res.data else None
+        return _copy_row(await self.auctions.get_or_load_async(auction_id, load))
+
+    def item(self, item_id: str):
+        """Item row, or None if it does not exist"""
+        def load():
+            res = supabase.table("items").select("*").eq("item_id", item_id).execute()
+            return res.data[0] if res.data else None
+        return _copy_row(self.items.get_or_load(item_id, load))
+
+    async def item_async(self, item_id: str):
+        async def load():
+            res = await async_db.table("items").select("*").eq("item_id", item_id).execute()
+            return res.data[0] if res.data else None
+        return _copy_row(await self.items.get_or_load_async(item_id, load))
+
+    def item_images(self, item_id: str) -> list:
+        """Image rows of an item ordered by position"""
+        def load():
+            res = supabase.table("item_images").select("*").eq("item_id", item_id).order("position").execute()
+            return res.data or []
+        return [dict(img) for img in self.images.get_or_load(item_id, load)]
+
+    async def item_images_async(self, item_id: str) -> list:
+        async def load():
+            res = await async_db.table("item_images").select("*").eq("item_id", item_id).order("position").execute()
+            return res.data or []
+        return [dict(img) for img in await self.images.get_or_load_async(item_id, load)]
+
+    def apply(self, auction_id: str, change: dict):
+        """Write through (or drop) whatever a change recorded by note_auction_change touched"""
+        kind = change.get("type")
+        if kind == "auction":
+            self.auctions.put(auction_id, dict(change["auction"]))
+        elif kind in ("item", "item_created"):
+            item = change["item"]
+            self.items.put(item["item_id"], dict(item))
+            if "images" in change:
+                self.images.put(item["item_id"], sorted(change["images"], key=lambda img: img["position"]))
+        elif kind in ("item_deleted", "bid", "buy_now"):
+            self.forget_items([change["item_id"]])
+        elif kind == "settled":
+            self.forget_items(change["item_ids"])
+        elif kind == "reset":
+            if change.get("item_id"):
+                self.images.invalidate(change["item_id"])
+            else:
+                self.forget_auction(auction_id)
+
+    def forget_items(self, item_ids: list):
+        for item_id in item_ids:
+            self.items.invalidate(item_id)
+            self.images.invalidate(item_id)
+
+    def forget_auction(self, auction_id: str):
+        """Drop an auction and every cached item of it (and their images)"""
+        self.auctions.invalidate(auction_id)
+        for item_id in self.items.invalidate_matching(lambda item: item.get("auction_id") == auction_id):
+            self.images.invalidate(item_id)
+
+    def stats(self):
+        return {"auctions": self.auctions.stats(), "items": self.items.stats(), "images": self.images.stats()}
+
+
+def _copy_row(row):
+    return dict(row) if row is not None else None
+
+
+entity_cache = EntityCache(ENTITY_CACHE_SIZE, ENTITY_CACHE_TTL)
+
+
+# ============================================
+# IDEMPOTENCY KEYS
+# ============================================
+# Clients may send an Idempotency-Key header with POST /items/{item_id}/bid and
+# /buy-now. The first request with a key runs normally and its outcome (success
+# or 4xx rejection) is kept for IDEMPOTENCY_TTL seconds; retries with the same
+# key are answered from memory without touching Supabase and without spending
+# admission tokens. 5xx failures are not kept, so those retries run again.
+# A retry that arrives while the original is still running waits for it.
+
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))  # seconds
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "100000"))
+IDEMPOTENCY_WAIT = float(os.getenv("IDEMPOTENCY_WAIT", "10"))  # seconds a retry waits for the original
+
+
+class _IdempotentResult:
+    __slots__ = ("fingerprint", "done", "expires", "body", "error")
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.expires = None
+        self.body = None
+        self.error = None
+
+
+class IdempotencyStore:
+    """Bounded, expiring store of request outcomes keyed by (endpoint, item_id, Idempotency-Key)"""
+
+    def __init__(self, ttl: float, max_keys: int):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.entries = OrderedDict()  # key -> _IdempotentResult, oldest first
+        self.lock = threading.Lock()
+        self.counters = {"executed": 0, "replayed": 0, "conflicts": 0}
+
+    def _live(self, key: tuple, now: float):
+        entry = self.entries.get(key)
+        if entry is not None and entry.expires is not None and entry.expires <= now:
+            del self.entries[key]
+            return None
+        return entry
+
+    def is_replay(self, key: tuple) -> bool:
+        """True if a completed outcome is stored for this key"""
+        with self.lock:
+            entry = self._live(key, time.monotonic())
+            return entry is not None and entry.done.is_set()
+
+    def run(self, key: tuple, fingerprint: str, response: Response, fn):
+        """Run fn once per key; replays return (or re-raise) the stored outcome"""
+        now = time.monotonic()
+        with self.lock:
+            entry = self._live(key, now)
+            owner = entry is None
+            if owner:
+                entry = self.entries[key] = _IdempotentResult(fingerprint)
+                # evict oldest finished entries beyond the bound; running ones stay
+                for old_key in list(self.entries):
+                    if len(self.entries) <= self.max_keys:
+                        break
+                    if self.entries[old_key].done.is_set():
+                        del self.entries[old_key]
+
+        if not owner:
+            if entry.fingerprint != fingerprint:
+                self.counters["conflicts"] += 1
+                raise HTTPException(422, "Idempotency-Key was already used for a different request")
+            if not entry.done.wait(IDEMPOTENCY_WAIT):
+                self.counters["conflicts"] += 1
+                raise HTTPException(409, "A request with this Idempotency-Key is still in progress")
+            if entry.body is None and entry.error is None:
+                # the original failed with a server error and was discarded
+                raise HTTPException(409, "The original request with this Idempotency-Key failed, please retry")
+            self.counters["replayed"] += 1
+            response.headers["Idempotent-Replayed"] = "true"
+            if entry.error is not None:
+                raise HTTPException(entry.error.status_code, entry.error.detail, headers=entry.error.headers)
+            return entry.body
+
+        self.counters["executed"] += 1
+        try:
+            entry.body = fn()
+            return entry.body
+        except HTTPException as e:
+            if e.status_code < 500:
+                entry.error = e
+            raise
+        finally:
+            with self.lock:
+                if entry.body is None and entry.error is None:
+                    self.entries.pop(key, None)
+                else:
+                    entry.expires = time.monotonic() + self.ttl
+            entry.done.set()
+
+    def stats(self):
+        return {"keys": len(self.entries), **self.counters}
+
+
+idempotency_store = IdempotencyStore(IDEMPOTENCY_TTL, IDEMPOTENCY_MAX_KEYS)
+
+
+def idempotent(scope: str, item_id: str, key: Optional[str], body: BaseModel, response: Response, fn):
+    """Run an endpoint body under its Idempotency-Key (if the client sent one)"""
+    if not key:
+        return fn()
+    return idempotency_store.run((scope, item_id, key), body.model_dump_json(), response, fn)
+
+
+# ============================================
+# ADMISSION CONTROL (TOKEN BUCKETS)
+# ============================================
+# In-memory token buckets in front of place_bid and buy_now, keyed by bidder
+# email, client IP and item_id. Checks run as async dependencies on the event
+# loop, so throttled requests are answered with 429 before they take a worker
+# thread away from the seller dashboard and listing endpoints.
+# Rates are tokens per second; set a rate to 0 to disable that bucket.
+
+ADMISSION_LIMITS = {
+    "bidder": (float(os.getenv("BID_RATE_PER_BIDDER", "2")), float(os.getenv("BID_BURST_PER_BIDDER", "5"))),
+    "ip": (float(os.getenv("BID_RATE_PER_IP", "10")), float(os.getenv("BID_BURST_PER_IP", "20"))),
+    "item": (float(os.getenv("BID_RATE_PER_ITEM", "200")), float(os.getenv("BID_BURST_PER_ITEM", "400"))),
+}
+ADMISSION_MAX_KEYS = int(os.getenv("ADMISSION_MAX_KEYS", "100000"))  # buckets kept per scope
+# proxies in front of the app that append to X-Forwarded-For (Cloud Run's front end is one)
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "1"))
+
+
+class TokenBucketLimiter:
+    """Token buckets for one scope; idle buckets are evicted least recently used first"""
+
+    def __init__(self, rate: float, burst: float, max_keys: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()  # key -> [tokens, last refill (monotonic)]
+        self.lock = threading.Lock()
+        self.counters = {"allowed": 0, "rejected": 0}
+
+    def acquire(self, key: str) -> float:
+        """Take one token; returns 0 if allowed, else seconds until a token is available"""
+        if self.rate <= 0 or not key:
+            return 0
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.pop(key, None) or [self.burst, now]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            self.buckets[key] = bucket
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                self.counters["allowed"] += 1
+                return 0
+            self.counters["rejected"] += 1
+            return (1 - bucket[0]) / self.rate
+
+
+admission_limiters = {
+    scope: TokenBucketLimiter(rate, burst, ADMISSION_MAX_KEYS)
+    for scope, (rate, burst) in ADMISSION_LIMITS.items()
+}
+
+
+def client_ip(request: Request) -> str:
+    """Caller IP as recorded by the outermost of our TRUSTED_PROXY_HOPS proxies"""
+    # clients can prepend anything to X-Forwarded-For; only the entries our own
+    # proxies appended (counted from the right) can be believed
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded and TRUSTED_PROXY_HOPS > 0:
+        hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+        if hops:
+            return hops[-min(TRUSTED_PROXY_HOPS, len(hops))]
+    return request.client.host if request.client else ""
+
+
+def admit(request: Request, item_id: str, email: str):
+    """Raise 429 with Retry-After if any bucket for this request is empty"""
+    keys = {"bidder": (email or "").strip().lower(), "ip": client_ip(request), "item": item_id}
+    for scope, key in keys.items():
+        wait = admission_limiters[scope].acquire(key)
+        if wait:
+            raise HTTPException(
+                429,
+                f"Too many requests ({scope} limit), please retry shortly",
+                headers={"Retry-After": str(math.ceil(wait))}
+            )
+
+
+async def admit_bid(request: Request, item_id: str, bid: "BidRequest", idempotency_key: Optional[str] = Header(None)):
+    # replays of a finished request are answered from the idempotency store for free
+    if idempotency_key and idempotency_store.is_replay(("bid", item_id, idempotency_key)):
+        return
+    admit(request, item_id, bid.bidder_email)
+
+
+async def admit_buy_now(request: Request, item_id: str, purchase: "BuyNowRequest", idempotency_key: Optional[str] = Header(None)):
+    if idempotency_key and idempotency_store.is_replay(("buy_now", item_id, idempotency_key)):
+        return
+    admit(request, item_id, purchase.buyer_email)
+
+
+# ============================================
+# LIVE AUCTION EVENTS (SERVER-SENT EVENTS)
+# ============================================
+# Viewers subscribe to GET /auctions/{auction_id}/stream instead of polling.
+# place_bid and buy_now publish each accepted change once; the hub serializes
+# it once and fans it out to every connected viewer of that auction.
+# The stream is anonymous, so bids on it carry no bidder identity.
+# Fan-out is per process: viewers connected to another instance don't see the
+# event, so clients keep a slow fallback refresh alongside the stream.
+
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "100"))  # events buffered per viewer
+STREAM_HEARTBEAT = float(os.getenv("STREAM_HEARTBEAT", "15"))  # seconds between keep-alive comments
+
+
+class AuctionEventHub:
+    """Per-auction fan-out of bid and buy-now events to streaming viewers"""
+
+    def __init__(self):
+        self.subscribers = {}  # auction_id -> set of asyncio.Queue, only touched on the event loop
+        self.loop = None
+        self.counters = {"published": 0, "delivered": 0, "dropped_viewers": 0}
+
+    def subscribe(self, auction_id: str) -> asyncio.Queue:
+        self.loop = asyncio.get_running_loop()
+        q = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        self.subscribers.setdefault(auction_id, set()).add(q)
+        return q
+
+    def unsubscribe(self, auction_id: str, q: asyncio.Queue):
+        viewers = self.subscribers.get(auction_id)
+        if viewers is not None:
+            viewers.discard(q)
+            if not viewers:
+                del self.subscribers[auction_id]
+
+    def viewer_count(self, auction_id: str) -> int:
+        return len(self.subscribers.get(auction_id, ()))
+
+    def publish(self, auction_id: str, event: str, data: dict):
+        """Thread-safe: called from sync endpoints running in the worker thread pool"""
+        if not auction_id or self.loop is None or auction_id not in self.subscribers:
+            return
+        message = f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+        self.counters["published"] += 1
+        self.loop.call_soon_threadsafe(self._fanout, auction_id, message)
+
+    def _fanout(self, auction_id: str, message: str):
+        for q in list(self.subscribers.get(auction_id, ())):
+            try:
+                q.put_nowait(message)
+                self.counters["delivered"] += 1
+            except asyncio.QueueFull:
+                # viewer can't keep up: disconnect it, the client reconnects and resyncs
+                self.unsubscribe(auction_id, q)
+                self.counters["dropped_viewers"] += 1
+                while not q.empty():
+                    q.get_nowait()
+                q.put_nowait(None)
+
+    def stats(self):
+        return {
+            "auctions": len(self.subscribers),
+            "viewers": sum(len(v) for v in self.subscribers.values()),
+            **self.counters,
+        }
+
+
+auction_events = AuctionEventHub()
+
+
+def record_accepted_bid(auction_id: str, item_id: str, outcome: str, row: dict, current_highest):
+    """Update bid summaries and notify viewers of a bid that changed the visible price"""
+    if outcome == "raise_max":
+        return  # hidden maximum raised, nothing visible changed
+    bid_summaries.record(item_id, row["amount"], row.get("created_at"))
+    # the change log feeds the seller's bid deltas too; public deltas strip it in public_changes
+    note_auction_change(auction_id, {"type": "bid", "item_id": item_id, "bid": public_bid(row), "current_highest": current_highest})
+    auction_events.publish(auction_id, "bid", {
+        "item_id": item_id,
+        "bid": anonymous_bid(row),
+        "current_highest": current_highest,
+    })
+
+
+# STREAM live bid and buy-now events for an auction
+@app.get("/auctions/{auction_id}/stream")
+async def stream_auction_events(auction_id: str, request: Request):
+    """
+    Server-Sent Events stream of 'bid' and 'buy_now' events for an auction.
+    Replaces client polling of /auctions/{auction_id}/all-bids.
+    """
+    q = auction_events.subscribe(auction_id)
+
+    async def event_stream():
+        try:
+            yield f"event: ready\ndata: {json.dumps({'auction_id': auction_id})}\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(q.get(), timeout=STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                if message is None:
+                    break
+                yield message
+        finally:
+            auction_events.unsubscribe(auction_id, q)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ============================================
+# IN-PROCESS BID ENGINE (OPTIONAL)
+# ============================================
+# Enable with BID_ENGINE_ENABLED=true. Hot items are held in memory and sharded
+# across worker threads by item_id, so each item's bids are validated strictly
+# in arrival order without a database round trip. Accepted bids are written to
+# the bids table in small batched inserts by a background flusher. Writes that
+# fail for a transient reason are retried; writes the database rejects outright
+# (e.g. a bid on an item deleted meanwhile) are set aside as dead letters and
+# reported in /metrics, so they never hold up later batches.
+# State lives in this process only - run a single worker process when enabled.
+
+BID_ENGINE_ENABLED = os.getenv("BID_ENGINE_ENABLED", "").lower() in ("1", "true", "yes")
+BID_ENGINE_SHARDS = int(os.getenv("BID_ENGINE_SHARDS", "8"))
+BID_ENGINE_FLUSH_SIZE = int(os.getenv("BID_ENGINE_FLUSH_SIZE", "50"))
+BID_ENGINE_FLUSH_INTERVAL = float(os.getenv("BID_ENGINE_FLUSH_INTERVAL", "0.05"))  # seconds
+BID_ENGINE_TIMEOUT = float(os.getenv("BID_ENGINE_TIMEOUT", "10"))  # seconds a request waits for its shard
+BID_ENGINE_FLUSH_BACKOFF = 10.0  # max seconds between retries of a failed flush
+BID_ENGINE_DEAD_LETTERS = int(os.getenv("BID_ENGINE_DEAD_LETTERS", "1000"))  # rejected writes kept for /metrics
+
+
+def permanent_write_error(e: Exception) -> bool:
+    """True for database errors that retrying the same write can never fix"""
+    if not isinstance(e, APIError) or not e.code:
+        return False
+    # 22xxx bad data, 23xxx constraint violations, 42xxx bad statement; PGRST1xx/2xx bad request
+    return e.code[:2] in ("22", "23", "42") or e.code.startswith(("PGRST1", "PGRST2"))
+
+
+def parse_timestamp(value):
+    """Parse an ISO timestamp from Supabase (handles trailing 'Z'); None if missing or invalid"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+class ItemBidState:
+    """In-memory bidding state for one item, owned by a single shard thread"""
+    __slots__ = ("item_id", "auction_id", "auction", "is_sold",
+                 "starting_bid", "min_increment", "leader")
+
+    def __init__(self, item_id, auction_id, auction, is_sold, starting_bid, min_increment, leader):
+        self.item_id = item_id
+        self.auction_id = auction_id
+        self.auction = auction  # status/start_time/end_time, used only if the scheduler has no answer
+        self.is_sold = is_sold
+        self.starting_bid = starting_bid
+        self.min_increment = min_increment
+        self.leader = leader  # highest bid row (with proxy max_amount); None until the first bid
+
+
+class BidEngine:
+    """Sharded, ordered bid validation with group-committed inserts"""
+
+    def __init__(self, shards: int, flush_size: int, flush_interval: float):
+        self.shard_count = max(1, shards)
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = flush_interval
+        self.shards = [queue.Queue() for _ in range(self.shard_count)]
+        self.states = [{} for _ in range(self.shard_count)]  # per-shard item_id -> ItemBidState
+        self.floors = [{} for _ in range(self.shard_count)]  # leading bid of invalidated items
+        self.pending = queue.Queue()  # ("insert" | "max", row) writes waiting to be flushed
+        self.dead_letters = deque(maxlen=BID_ENGINE_DEAD_LETTERS)  # writes the database rejected
+        self.counters = {"accepted": 0, "rejected": 0, "flushed": 0, "flush_batches": 0, "flush_errors": 0,
+                         "dead_lettered": 0}
+        self.last_flush_error = None
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._started:
+            return
+        with self._start_lock:
+            if self._started:
+                return
+            for index in range(self.shard_count):
+                threading.Thread(target=self._run_shard, args=(index,), daemon=True, name=f"bid-shard-{index}").start()
+            threading.Thread(target=self._run_flusher, daemon=True, name="bid-flusher").start()
+            self._started = True
+
+    def _shard_for(self, item_id: str) -> int:
+        return zlib.crc32(item_id.encode()) % self.shard_count
+
+    # ---- request side ----
+
+    def place(self, item_id: str, bid: "BidRequest"):
+        """Submit a bid to the item's shard and wait for its verdict"""
+        self._ensure_started()
+        future = Future()
+        self.shards[self._shard_for(item_id)].put(("bid", item_id, bid, future))
+        try:
+            return future.result(timeout=BID_ENGINE_TIMEOUT)
+        except TimeoutError:
+            raise HTTPException(503, "Bid engine is busy, please retry")
+
+    def invalidate(self, item_id: str):
+        """Drop cached state for an item so the next bid reloads it from the database"""
+        if self._started:
+            self.shards[self._shard_for(item_id)].put(("invalidate", item_id, None, None))
+
+    def invalidate_auction(self, auction_id: str):
+        """Drop cached state for every item in an auction (status or end time changed)"""
+        if self._started:
+            for shard in self.shards:
+                shard.put(("invalidate_auction", auction_id, None, None))
+
+    def stats(self):
+        return {
+            "enabled": BID_ENGINE_ENABLED,
+            "shards": self.shard_count,
+            "hot_items": sum(len(s) for s in self.states),
+            "pending_flush": self.pending.qsize(),
+            "last_flush_error": self.last_flush_error,
+            # no bidder identity here; the full rows are in the log
+            "dead_letters": [
+                {"kind": kind, "bid_id": row.get("bid_id"), "item_id": row.get("item_id"),
+                 "amount": row.get("amount"), "error": error}
+                for kind, row, error in list(self.dead_letters)
+            ],
+            **self.counters,
+        }
+
+    # ---- shard side ----
+
+    def _run_shard(self, index: int):
+        states = self.states[index]
+        floors = self.floors[index]
+        inbox = self.shards[index]
+        while True:
+            kind, key, bid, future = inbox.get()
+            if kind == "invalidate":
+                self._evict(states, floors, key)
+                continue
+            if kind == "invalidate_auction":
+                for item_id in [i for i, s in states.items() if s.auction_id == key]:
+                    self._evict(states, floors, item_id)
+                continue
+            try:
+                future.set_result(self._apply_bid(states, floors, key, bid))
+                self.counters["accepted"] += 1
+            except Exception as e:
+                self.counters["rejected"] += 1
+                future.set_exception(e)
+
+    @staticmethod
+    def _evict(states: dict, floors: dict, item_id: str):
+        # remember the leading bid: it may not be flushed to the database yet
+        state = states.pop(item_id, None)
+        if state is not None and state.leader is not None:
+            floor = floors.get(item_id)
+            if floor is None or state.leader["amount"] >= floor["amount"]:
+                floors[item_id] = state.leader
+
+    def _load_state(self, item_id: str) -> ItemBidState:
+        item = supabase.table("items").select(
+            "item_id, auction_id, starting_bid, min_increment, is_sold, auctions(status, start_time, end_time)"
+        ).eq("item_id", item_id).execute()
+        if not item.data:
+            raise HTTPException(404, "Item not found")
+        item_data = item.data[0]
+        auction_data = item_data.get("auctions") or {}
+        top = supabase.table("bids").select("*").eq("item_id", item_id).order("amount", desc=True).order("created_at").limit(1).execute()
+        return ItemBidState(
+            item_id=item_id,
+            auction_id=item_data.get("auction_id"),
+            auction=auction_data,
+            is_sold=bool(item_data.get("is_sold")),
+            starting_bid=item_data.get("starting_bid", 0) or 0,
+            min_increment=item_data.get("min_increment", 1) or 1,
+            leader=top.data[0] if top.data else None,
+        )
+
+    def _apply_bid(self, states: dict, floors: dict, item_id: str, bid: "BidRequest"):
+        state = states.get(item_id)
+        if state is None:
+            state = self._load_state(item_id)
+            floor = floors.pop(item_id, None)
+            if floor is not None and (state.leader is None or floor["amount"] >= state.leader["amount"]):
+                state.leader = floor
+            states[item_id] = state
+
+        now = time.time()
+        phase = auction_phase(state.auction_id, state.auction)
+        if phase in PHASE_REJECTIONS:
+            raise HTTPException(400, PHASE_REJECTIONS[phase])
+        if state.is_sold:
+            raise HTTPException(400, "Item has already been sold")
+
+        outcome, row = resolve_proxy_bid(state.leader, state.starting_bid, state.min_increment, bid)
+        if outcome == "raise_max":
+            state.leader = row
+            self.pending.put(("max", row))
+            return bid_response(outcome, row, row["amount"])
+
+        row = {
+            # the id is assigned here so the flusher can retry the insert without duplicating it
+            "bid_id": str(uuid.uuid4()),
+            "item_id": item_id,
+            **row,
+            "created_at": datetime.fromtimestamp(now, timezone.utc).isoformat(),
+        }
+        state.leader = row
+        self.pending.put(("insert", row))
+        record_accepted_bid(state.auction_id, item_id, outcome, row, row["amount"])
+        return bid_response(outcome, row, row["amount"])
+
+    # ---- group commit ----
+
+    def _run_flusher(self):
+        while True:
+            batch = [self.pending.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.flush_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+            for _ in batch:
+                self.pending.task_done()
+
+    def wait_flushed(self, timeout: float = BID_ENGINE_TIMEOUT) -> bool:
+        """Block until every accepted bid has been written (or the timeout passes)"""
+        deadline = time.monotonic() + timeout
+        while self.pending.unfinished_tasks:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _flush(self, batch: list):
+        # one insert for the batch, then one current_bid update per item (its highest)
+        # and any proxy maximum raises, which always follow the row they update.
+        # These bids were already confirmed to bidders, so a batch that fails for a
+        # transient reason is retried until it is written; later batches wait behind
+        # it to keep writes in order. Writes the database rejects are dead-lettered.
+        rows = [row for kind, row in batch if kind == "insert"]
+        max_updates = [row for kind, row in batch if kind == "max"]
+        highest_by_item = {}
+        for row in rows:
+            highest_by_item[row["item_id"]] = max(row["amount"], highest_by_item.get(row["item_id"], row["amount"]))
+        attempt = 0
+        while True:
+            try:
+                if rows:
+                    try:
+                        self._insert(rows)
+                    except Exception as e:
+                        if not permanent_write_error(e):
+                            raise
+                        # find the rejected rows; the rest of the batch still goes in
+                        for row in rows:
+                            self._write_or_dead_letter("insert", row, lambda: self._insert([row]))
+                    rows = []
+                for item_id, amount in list(highest_by_item.items()):
+                    self._write_or_dead_letter(
+                        "current_bid", {"item_id": item_id, "amount": amount},
+                        lambda: supabase.table("items").update({"current_bid": amount}).eq("item_id", item_id).execute()
+                    )
+                    entity_cache.items.invalidate(item_id)  # drop a row read before this write landed
+                    del highest_by_item[item_id]
+                while max_updates:
+                    row = max_updates[0]
+                    self._write_or_dead_letter(
+                        "max", row,
+                        lambda: supabase.table("bids").update({"max_amount": row["max_amount"]}).eq("bid_id", row["bid_id"]).execute()
+                    )
+                    max_updates.pop(0)
+                self.counters["flushed"] += len(batch)
+                self.counters["flush_batches"] += 1
+                return
+            except Exception as e:
+                attempt += 1
+                self.counters["flush_errors"] += 1
+                self.last_flush_error = str(e)
+                logger.error("Bid flush of %d writes failed (attempt %d), retrying: %s", len(batch), attempt, e)
+                time.sleep(min(BID_ENGINE_FLUSH_BACKOFF, 0.5 * attempt))
+
+    @staticmethod
+    def _insert(rows: list):
+        # a retry after a lost response must not insert the same bids twice
+        supabase.table("bids").upsert(rows, on_conflict="bid_id", ignore_duplicates=True).execute()
+
+    def _write_or_dead_letter(self, kind: str, row: dict, write):
+        """Run one write; set it aside if the database rejects it, re-raise anything transient"""
+        try:
+            write()
+        except Exception as e:
+            if not permanent_write_error(e):
+                raise
+            self.dead_letters.append((kind, row, str(e)))
+            self.counters["dead_lettered"] += 1
+            logger.error("Bid engine write rejected, dead-lettered: %s %s: %s", kind, row, e)
+
+
+bid_engine = BidEngine(BID_ENGINE_SHARDS, BID_ENGINE_FLUSH_SIZE, BID_ENGINE_FLUSH_INTERVAL)
+
+
+# ============================================
+# AUCTION LIFECYCLE SCHEDULER
+# ============================================
+# Published auctions are tracked in memory with their start/end times (parsed
+# once) and a heap of pending deadlines. A background thread opens auctions at
+# start_time and closes them at end_time, so bid validation is a dictionary
+# lookup instead of per-request timestamp parsing.
+# Published auctions are loaded at startup and reloaded every
+# AUCTION_SCHEDULER_RELOAD seconds, which picks up auctions whose deadline
+# passed while the server was down and changes made by other worker processes.
+# Between reloads a window can be stale (another process may have moved the
+# end time), so the scheduler's close only applies while the auction is still
+# published and its end_time has passed in the database, and the bid path
+# leaves the final window check to the database.
+
+AUCTION_SCHEDULER_ENABLED = os.getenv("AUCTION_SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+AUCTION_SCHEDULER_RELOAD = float(os.getenv("AUCTION_SCHEDULER_RELOAD", "300"))  # seconds
+AUCTION_SCHEDULER_RETRY = 5.0  # seconds before retrying a failed close
+AUCTION_LOAD_PAGE = 1000
+
+
+class AuctionLifecycle:
+    """Bidding windows of published auctions plus a heap of open/close deadlines"""
+
+    def __init__(self):
+        self.windows = {}  # auction_id -> (start_ts, end_ts), epoch seconds or None
+        self.heap = []  # (deadline, kind, auction_id); stale entries are skipped when popped
+        self.scheduled = set()  # heap entries, so reloads don't queue duplicates
+        self.cond = threading.Condition()
+        self.counters = {"opened": 0, "closed": 0, "close_errors": 0, "reloads": 0}
+        self.loaded = False
+        self._started = False
+
+    # ---- bookkeeping ----
+
+    def track(self, auction: dict):
+        """Start (or refresh) tracking an auction row; non-published auctions are dropped"""
+        auction_id = auction.get("auction_id")
+        if auction.get("status") != "published":
+            self.forget(auction_id)
+            return
+        start_dt = parse_timestamp(auction.get("start_time"))
+        end_dt = parse_timestamp(auction.get("end_time"))
+        window = (start_dt.timestamp() if start_dt else None, end_dt.timestamp() if end_dt else None)
+        with self.cond:
+            self.windows[auction_id] = window
+            if window[0] is not None and window[0] > time.time():
+                self._push(window[0], "open", auction_id)
+            if window[1] is not None:
+                self._push(window[1], "close", auction_id)
+            self.cond.notify()
+
+    def forget(self, auction_id: str):
+        with self.cond:
+            self.windows.pop(auction_id, None)
+
+    def _push(self, deadline: float, kind: str, auction_id: str):
+        entry = (deadline, kind, auction_id)
+        if entry not in self.scheduled:
+            self.scheduled.add(entry)
+            heapq.heappush(self.heap, entry)
+
+    def phase(self, auction_id: str, now: float = None):
+        """
+        'upcoming', 'open' or 'ended' for a published auction, 'inactive' for any
+        other auction once loaded, None while the scheduler has not loaded yet.
+        """
+        window = self.windows.get(auction_id)
+        if window is None:
+            return "inactive" if self.loaded else None
+        now = time.time() if now is None else now
+        if window[1] is not None and now > window[1]:
+            return "ended"
+        if window[0] is not None and now < window[0]:
+            return "upcoming"
+        return "open"
+
+    def load(self):
+        """Track every published auction (paged) and drop auctions no longer published"""
+        seen = set()
+        offset = 0
+        while True:
+            page = supabase.table("auctions").select("auction_id, status, start_time, end_time").eq(
+                "status", "published"
+            ).order("auction_id").range(offset, offset + AUCTION_LOAD_PAGE - 1).execute()
+            rows = page.data or []
+            for auction in rows:
+                seen.add(auction["auction_id"])
+                self.track(auction)
+            if len(rows) < AUCTION_LOAD_PAGE:
+                break
+            offset += AUCTION_LOAD_PAGE
+        with self.cond:
+            for auction_id in [a for a in self.windows if a not in seen]:
+                del self.windows[auction_id]
+        self.loaded = True
+        self.counters["reloads"] += 1
+
+    # ---- scheduler thread ----
+
+    def start(self):
+        if not self._started:
+            self._started = True
+            threading.Thread(target=self._run, daemon=True, name="auction-scheduler").start()
+
+    def _run(self):
+        next_reload = 0
+        while True:
+            if time.time() >= next_reload:
+                try:
+                    self.load()
+                except Exception as e:
+                    logger.error("Auction scheduler reload failed: %s", e)
+                next_reload = time.time() + AUCTION_SCHEDULER_RELOAD
+            due = []
+            with self.cond:
+                now = time.time()
+                while self.heap and self.heap[0][0] <= now:
+                    entry = heapq.heappop(self.heap)
+                    self.scheduled.discard(entry)
+                    due.append(entry)
+                if not due:
+                    wake = min(self.heap[0][0] if self.heap else next_reload, next_reload)
+                    self.cond.wait(max(0.0, wake - now))
+                    continue
+            for deadline, kind, auction_id in due:
+                self._fire(deadline, kind, auction_id)
+
+    def _fire(self, deadline: float, kind: str, auction_id: str):
+        window = self.windows.get(auction_id)
+        # skip auctions no longer published and deadlines that were moved later
+        # (a close retry fires after the end time, so it still counts)
+        if window is None:
+            return
+        if kind == "open" and window[0] != deadline:
+            return
+        if kind == "close" and (window[1] is None or window[1] > deadline):
+            return
+        if kind == "open":
+            self.counters["opened"] += 1
+            auction_events.publish(auction_id, "auction_open", {"auction_id": auction_id})
+            note_auction_change(auction_id, {"type": "auction_open"})
+            return
+        try:
+            if close_auction_now(auction_id, only_if_published=True, only_if_ended=True):
+                start_settlement(auction_id)
+                self.counters["closed"] += 1
+            else:
+                # closed elsewhere or the end time moved; pick up the current row
+                self.refresh(auction_id)
+        except Exception as e:
+            self.counters["close_errors"] += 1
+            logger.error("Auto-close of auction %s failed: %s", auction_id, e)
+            with self.cond:
+                self._push(time.time() + AUCTION_SCHEDULER_RETRY, "close", auction_id)
+
+    def refresh(self, auction_id: str):
+        """Re-read one auction and track it again (dropped if no longer published)"""
+        res = supabase.table("auctions").select("auction_id, status, start_time, end_time").eq(
+            "auction_id", auction_id
+        ).execute()
+        if res.data:
+            self.track(res.data[0])
+        else:
+            self.forget(auction_id)
+
+    def stats(self):
+        return {
+            "enabled": AUCTION_SCHEDULER_ENABLED,
+            "loaded": self.loaded,
+            "tracked": len(self.windows),
+            "pending_deadlines": len(self.heap),
+            **self.counters,
+        }
+
+
+auction_lifecycle = AuctionLifecycle()
+
+# Bid rejections for lifecycle phases (see AuctionLifecycle.phase)
+PHASE_REJECTIONS = {
+    "inactive": "Auction is not active",
+    "upcoming": "Auction has not started yet",
+    "ended": "Auction has ended",
+}
+
+
+def auction_phase(auction_id: str, auction: dict):
+    """Phase from the scheduler; parses the auction row only if the scheduler has no answer"""
+    phase = auction_lifecycle.phase(auction_id)
+    if phase is not None and (phase != "inactive" or auction.get("status") != "published"):
+        return phase
+    return row_phase(auction)
+
+
+def row_phase(auction: dict):
+    """Phase of an auction row as read from the database"""
+    if auction.get("status") != "published":
+        return "inactive"
+    start_dt = parse_timestamp(auction.get("start_time"))
+    end_dt = parse_timestamp(auction.get("end_time"))
+    now = datetime.now(timezone.utc)
+    if end_dt and now > end_dt:
+        return "ended"
+    if start_dt and now < start_dt:
+        return "upcoming"
+    return "open"
+
+
+def close_auction_now(auction_id: str, only_if_published: bool = False, only_if_ended: bool = False):
+    """Set an auction to closed and notify caches, the bid engine and live viewers; returns the row"""
+    query = supabase.table("auctions").update({"status": "closed"}).eq("auction_id", auction_id)
+    if only_if_published:
+        query = query.eq("status", "published")
+    if only_if_ended:
+        query = query.lte("end_time", datetime.now(timezone.utc).isoformat())
+    res = query.execute()
+    auction_lifecycle.forget(auction_id)
+    if not res.data:
+        return None
+    bid_engine.invalidate_auction(auction_id)
+    note_auction_change(auction_id, {"type": "auction", "auction": res.data[0]})
+    auction_events.publish(auction_id, "closed", {"auction_id": auction_id})
+    return res.data[0]
+
+
+@app.on_event("startup")
+def start_auction_scheduler():
+    if AUCTION_SCHEDULER_ENABLED:
+        auction_lifecycle.start()
+
+
+# ============================================
+# BACKGROUND JOBS
+# ============================================
+# Long-running server-side work (auction settlement, bulk operations) runs on a
+# small thread pool and reports progress through GET /jobs/{job_id}. At most one
+# job per (kind, target) is active; starting it again returns the running job.
+# Job records live in this process only and the oldest finished ones are dropped.
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "500"))  # finished jobs kept for status lookups
+
+
+class Job:
+    """Status and progress of one background job"""
+
+    def __init__(self, kind: str, target: str):
+        self.job_id = str(uuid.uuid4())
+        self.kind = kind
+        self.target = target
+        self.status = "queued"  # queued -> running -> completed | failed
+        self.done = 0
+        self.total = None
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now(timezone.utc).isoformat()
+        self.finished_at = None
+
+    def progress(self, done: int, total: int = None):
+        self.done = done
+        if total is not None:
+            self.total = total
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "target": self.target,
+            "status": self.status,
+            "progress": {"done": self.done, "total": self.total},
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobRegistry:
+    """Runs jobs on a thread pool and keeps their status for polling"""
+
+    def __init__(self, workers: int, history: int):
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="job")
+        self.history = history
+        self.jobs = OrderedDict()  # job_id -> Job, oldest first
+        self.active = {}  # (kind, target) -> Job
+        self.lock = threading.Lock()
+
+    def start(self, kind: str, target: str, fn) -> Job:
+        """Run fn(job) in the background unless the same job is already queued or running"""
+        with self.lock:
+            job = self.active.get((kind, target))
+            if job is not None:
+                return job
+            job = Job(kind, target)
+            self.jobs[job.job_id] = job
+            self.active[(kind, target)] = job
+            self._trim()
+        self.pool.submit(self._run, job, fn)
+        return job
+
+    def _run(self, job: Job, fn):
+        job.status = "running"
+        try:
+            job.result = fn(job)
+            job.status = "completed"
+        except Exception as e:
+            job.error = e.detail if isinstance(e, HTTPException) else str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = datetime.now(timezone.utc).isoformat()
+            with self.lock:
+                self.active.pop((job.kind, job.target), None)
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished_at]
+        for job_id in finished[:max(0, len(self.jobs) - self.history)]:
+            del self.jobs[job_id]
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    def stats(self):
+        with self.lock:
+            return {"jobs": len(self.jobs), "active": len(self.active)}
+
+
+jobs = JobRegistry(JOB_WORKERS, JOB_HISTORY)
+
+
+# GET background job status and progress
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """
+    Status and progress of a background job.
+    Jobs are tracked by the instance that started them, so with several
+    instances behind a load balancer a poll can get a 404 for a live job.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found")
+    return job.to_dict()
+
+
+# ============================================
+# AUCTION SETTLEMENT
+# ============================================
+# When an auction closes, a settlement job picks the highest bid (earliest on
+# ties) for every listed, unsold item, creates the winning orders in one batched
+# insert and marks the items sold in one bulk update. Items that are already
+# sold or already have an order are skipped, so re-running it is safe.
+# The settle_auction RPC (sql/settle_auction.sql) does all of it in one
+# statement; without it the same steps run here in chunked queries.
+
+WIN_ORDER_TYPE = "auction_win"
+GUEST_BUYER_ID = "00000000-0000-0000-0000-000000000000"  # placeholder for guest buyers, as in buy_now
+
+
+def start_settlement(auction_id: str) -> Job:
+    return jobs.start("settlement", auction_id, lambda job: settle_auction(auction_id, job))
+
+
+def settle_auction(auction_id: str, job: Job) -> dict:
+    """Create winning orders for a closed auction; returns counts"""
+    # bids accepted by the in-process engine may still be waiting to be written
+    if BID_ENGINE_ENABLED and not bid_engine.wait_flushed():
+        raise HTTPException(503, "Bid engine has unflushed bids, retry settlement shortly")
+
+    try:
+        res = supabase.rpc("settle_auction", {"p_auction_id": auction_id}).execute()
+        result = res.data or {}
+        job.progress(result.get("items_considered", 0), result.get("items_considered", 0))
+        sold_item_ids = result.pop("sold_item_ids", None) or []
+    except APIError as e:
+        if e.code != "PGRST202":
+            raise
+        # function not deployed yet - same steps in chunked queries
+        result, sold_item_ids = settle_auction_fallback(auction_id, job)
+
+    if sold_item_ids:
+        bid_engine.invalidate_auction(auction_id)
+        note_auction_change(auction_id, {"type": "settled", "item_ids": sold_item_ids})
+        auction_events.publish(auction_id, "settled", {"item_ids": sold_item_ids})
+    return result
+
+
+def settle_auction_fallback(auction_id: str, job: Job):
+    items = iter_pages(lambda: supabase.table("items").select("item_id, is_sold")
+                       .eq("auction_id", auction_id).eq("is_listed", True).order("item_id"))
+    item_ids = [item["item_id"] for item in items if not item.get("is_sold")]
+    job.progress(0, len(item_ids))
+
+    orders = []
+    done = 0
+    for chunk in chunked(item_ids):
+        ordered = supabase.table("orders").select("item_id").in_("item_id", chunk).execute()
+        has_order = {row["item_id"] for row in ordered.data or []}
+        # paged: a chunk's bids can run past the PostgREST row cap, and each
+        # item's highest (then earliest) bid comes first within its run
+        bids = iter_pages(lambda: supabase.table("bids").select(
+            "item_id, bidder_id, bidder_email, bidder_name, amount"
+        ).in_("item_id", chunk).order("item_id").order("amount", desc=True).order("created_at").order("bid_id"))
+        winners = {}
+        for bid in bids:
+            winners.setdefault(bid["item_id"], bid)
+        for item_id, bid in winners.items():
+            if item_id in has_order:
+                continue
+            orders.append({
+                "item_id": item_id,
+                "auction_id": auction_id,
+                "buyer_id": bid.get("bidder_id") or GUEST_BUYER_ID,
+                "buyer_email": bid["bidder_email"],
+                "buyer_name": bid.get("bidder_name"),
+                "amount": bid["amount"],
+                "order_type": WIN_ORDER_TYPE,
+            })
+        done += len(chunk)
+        job.progress(done)
+
+    sold_at = datetime.now(timezone.utc).isoformat()
+    sold_item_ids = [order["item_id"] for order in orders]
+    for chunk in chunked(orders):
+        supabase.table("orders").insert(chunk).execute()
+    for chunk in chunked(sold_item_ids):
+        supabase.table("items").update({"is_sold": True, "sold_at": sold_at}).in_("item_id", chunk).execute()
+
+    return {
+        "items_considered": len(item_ids),
+        "orders_created": len(orders),
+        "items_without_bids": len(item_ids) - len(orders),
+    }, sold_item_ids
+
+
 # ============================================
 # BIDDING SYSTEM ENDPOINTS
 # ============================================
@@ -1344,6 +3812,9 @@ def update_auction_settings(auction_id: str, settings: AuctionSettingsUpdate):
     if not res.data:
         raise HTTPException(500, "Failed to update auction settings")
     
+    auction_lifecycle.track(res.data[0])
+    bid_engine.invalidate_auction(auction_id)
+    note_auction_change(auction_id, {"type": "auction", "auction": res.data[0]})
     return res.data[0]
 
 
@@ -1364,6 +3835,9 @@ def publish_auction(auction_id: str):
     if not res.data:
         raise HTTPException(500, "Failed to publish auction")
     
+    auction_lifecycle.track(res.data[0])
+    bid_engine.invalidate_auction(auction_id)
+    note_auction_change(auction_id, {"type": "auction", "auction": res.data[0]})
     return {"message": "Auction published successfully", "auction": res.data[0]}
 
 
@@ -1375,76 +3849,105 @@ def close_auction(auction_id: str):
     if not auction.data:
         raise HTTPException(404, "Auction not found")
     
-    res = supabase.table("auctions").update({"status": "closed"}).eq("auction_id", auction_id).execute()
-    if not res.data:
+    closed = close_auction_now(auction_id)
+    if not closed:
         raise HTTPException(500, "Failed to close auction")
     
-    return {"message": "Auction closed successfully", "auction": res.data[0]}
+    return {"message": "Auction closed successfully", "auction": closed, "settlement": start_settlement(auction_id).to_dict()}
+
+
+# RECOMPUTE price stats for every item in an auction
+@app.post("/auctions/{auction_id}/pricing/refresh")
+def refresh_auction_pricing(auction_id: str):
+    """Recompute item price stats from comps for a whole auction in one vectorized pass"""
+    auction = supabase.table("auctions").select("auction_id").eq("auction_id", auction_id).execute()
+    if not auction.data:
+        raise HTTPException(404, "Auction not found")
+    computed = pricing_stats.refresh_auction(auction_id)
+    note_auction_change(auction_id, {"type": "pricing"})
+    return {"auction_id": auction_id, "items_priced": len(computed)}
+
+
+# SETTLE a closed auction (re-run is safe: already settled items are skipped)
+@app.post("/auctions/{auction_id}/settle")
+def settle_closed_auction(auction_id: str):
+    """Start (or return the running) settlement job; poll GET /jobs/{job_id} for progress"""
+    auction = supabase.table("auctions").select("status").eq("auction_id", auction_id).execute()
+    if not auction.data:
+        raise HTTPException(404, "Auction not found")
+    if auction.data[0].get("status") != "closed":
+        raise HTTPException(400, "Only closed auctions can be settled")
+    return start_settlement(auction_id).to_dict()
 
 
 # GET public auction details (for public viewing)
 @app.get("/auctions/{auction_id}/public")
-def get_public_auction(auction_id: str):
-    """Get auction details for public viewing - includes items with bids"""
-    auction = supabase.table("auctions").select("*").eq("auction_id", auction_id).execute()
+def get_public_auction(auction_id: str, request: Request, response: Response, since: str = None):
+    """
+    Get auction details for public viewing - includes items with bids.
+    Pass the Auction-Cursor response header (also the cursor field of delta
+    responses) as since= to get only the changes after it.
+    Supports If-None-Match (304 when nothing changed).
+    Full payloads are served from public_auction_cache until a write to the
+    auction or PUBLIC_CACHE_TTL; the cursor is issued per response, so a cached
+    body never hands out a cursor that is already close to CHANGE_LOG_MAX_AGE.
+    """
+    unchanged = not_modified(request, response, auction_id, f"public-{since or ''}")
+    if unchanged:
+        return unchanged
+    changes, cursor = change_log.since(auction_id, since)
+    response.headers["Auction-Cursor"] = cursor
+    if changes is not None:
+        return {"auction_id": auction_id, "cursor": cursor, "full": False, "changes": public_changes(changes)}
+    
+    etag = response.headers["ETag"]
+    version = change_log.version(auction_id)
+    payload = public_auction_cache.get(auction_id, version)
+    if payload is None:
+        def fetch():
+            built = EncodedPayload(dumps(build_public_auction(auction_id)))
+            public_auction_cache.put(auction_id, version, built)
+            return built
+        payload = single_flight.do(("public_auction", auction_id, version), fetch)
+    return payload_response(payload, request, {"ETag": etag, "Auction-Cursor": cursor})
+
+
+def build_public_auction(auction_id: str) -> dict:
+    """Assemble the public auction payload: auction, items and images in one query, bids from summaries"""
+    auction = supabase.table("auctions").select("*, items(*, item_images(*))").eq("auction_id", auction_id).execute()
     if not auction.data:
         raise HTTPException(404, "Auction not found")
     
     auction_data = auction.data[0]
+    items_data = auction_data.pop("items", None) or []
     
     # Only show listed items if auction is published or closed
     # For draft auctions, show all items (for preview) but mark as preview
     # For published/closed auctions, only show is_listed=true items
     if auction_data.get("status") in ["published", "closed"]:
-        items = supabase.table("items").select("*").eq("auction_id", auction_id).eq("is_listed", True).order("created_at", desc=False).execute()
-    else:
-        # For draft/preview, show all items so seller can preview
-        items = supabase.table("items").select("*").eq("auction_id", auction_id).order("created_at", desc=False).execute()
+        items_data = [item for item in items_data if item.get("is_listed")]
+    items_data.sort(key=lambda item: item.get("created_at") or "")
     
-    items_data = items.data if items.data else []
-    
-    # Get images for all items
     if items_data:
         item_ids = [item["item_id"] for item in items_data]
-        images = supabase.table("item_images").select("*").in_("item_id", item_ids).execute()
-        images_data = images.data if images.data else []
-        
-        # Group images by item_id
-        images_by_item = {}
-        for img in images_data:
-            iid = img["item_id"]
-            if iid not in images_by_item:
-                images_by_item[iid] = []
-            images_by_item[iid].append(img)
-        
-        # Batch fetch all bids for all items (instead of N+1 queries)
-        all_bids = supabase.table("bids").select("*").in_("item_id", item_ids).order("amount", desc=True).execute()
-        all_bids_data = all_bids.data if all_bids.data else []
-        
-        # Group bids by item_id and calculate highest bid + count
-        bids_by_item = {}
-        bid_counts = {}
-        for bid in all_bids_data:
-            iid = bid["item_id"]
-            if iid not in bids_by_item:
-                bids_by_item[iid] = bid  # First bid is highest (ordered desc)
-                bid_counts[iid] = 0
-            bid_counts[iid] += 1
+        summaries = bid_summaries.get_many(item_ids)
         
         # Assign images and bid info to each item
         for item in items_data:
-            item["images"] = images_by_item.get(item["item_id"], [])
+            change_log.remember_item(item["item_id"], auction_id)
+            item["images"] = item.pop("item_images", None) or []
             
-            highest_bid = bids_by_item.get(item["item_id"])
-            if highest_bid:
-                item["current_bid"] = highest_bid["amount"]
-                item["bid_count"] = bid_counts.get(item["item_id"], 0)
+            summary = summaries[item["item_id"]]
+            if summary["bid_count"]:
+                item["current_bid"] = summary["highest_bid"]
+                item["bid_count"] = summary["bid_count"]
             else:
                 item["current_bid"] = item.get("starting_bid", 0) or 0
                 item["bid_count"] = 0
     
     return {
         "auction": auction_data,
+        "full": True,
         "items": items_data
     }
 
@@ -1453,8 +3956,10 @@ def get_public_auction(auction_id: str):
 @app.get("/auctions/public")
 def list_public_auctions():
     """List all published auctions for public browsing"""
-    auctions = supabase.table("auctions").select("*").eq("status", "published").order("created_at", desc=True).execute()
-    return {"auctions": auctions.data if auctions.data else []}
+    def fetch():
+        auctions = supabase.table("auctions").select("*").eq("status", "published").order("created_at", desc=True).execute()
+        return {"auctions": auctions.data if auctions.data else []}
+    return single_flight.do(("public_auctions",), fetch)
 
 
 # BATCH update item auction settings (must be before /items/{item_id}/auction-settings to avoid route conflict)
@@ -1480,6 +3985,10 @@ def batch_update_item_auction_settings(settings: BatchItemAuctionSettings):
     # Update all items in a single query using .in_() filter
     res = supabase.table("items").update(updates).in_("item_id", settings.item_ids).execute()
     updated_items = res.data if res.data else []
+    for item_id in settings.item_ids:
+        bid_engine.invalidate(item_id)
+    for item in updated_items:
+        note_auction_change(item.get("auction_id"), {"type": "item", "item": item})
     
     return {
         "message": f"Updated {len(updated_items)} items",
@@ -1491,8 +4000,7 @@ def batch_update_item_auction_settings(settings: BatchItemAuctionSettings):
 @app.put("/items/{item_id}/auction-settings")
 def update_item_auction_settings(item_id: str, settings: ItemAuctionSettings):
     """Update auction-specific settings for an item"""
-    item = supabase.table("items").select("item_id").eq("item_id", item_id).execute()
-    if not item.data:
+    if entity_cache.item(item_id) is None:
         raise HTTPException(404, "Item not found")
     
     updates = {}
@@ -1514,13 +4022,170 @@ def update_item_auction_settings(item_id: str, settings: ItemAuctionSettings):
     if not res.data:
         raise HTTPException(500, "Failed to update item auction settings")
     
+    bid_engine.invalidate(item_id)
+    note_auction_change(res.data[0].get("auction_id"), {"type": "item", "item": res.data[0]})
     return res.data[0]
 
 
+BIDS_PAGE_SIZE = int(os.getenv("BIDS_PAGE_SIZE", "100"))  # default page size for /items/{item_id}/bids
+BIDS_MAX_PAGE_SIZE = int(os.getenv("BIDS_MAX_PAGE_SIZE", "500"))
+
+# Rejection statuses returned by the place_bid_atomic RPC (see sql/place_bid_atomic.sql)
+BID_REJECTIONS = {
+    "not_found": (404, "Item not found"),
+    "inactive": (400, "Auction is not active"),
+    "not_started": (400, "Auction has not started yet"),
+    "ended": (400, "Auction has ended"),
+    "sold": (400, "Item has already been sold"),
+}
+
+
+def guest_bidder_id(email: str) -> str:
+    """Deterministic UUID for a guest bidder so the same email always gets the same ID"""
+    import hashlib
+    email_hash = hashlib.md5(email.lower().encode()).hexdigest()
+    return f"{email_hash[:8]}-{email_hash[8:12]}-{email_hash[12:16]}-{email_hash[16:20]}-{email_hash[20:32]}"
+
+
+def resolve_proxy_bid(leader, starting_bid, min_increment, bid: BidRequest):
+    """
+    Resolve an incoming bid against the current leading bid in one pass (proxy bidding).
+    `leader` is the highest bid row (with its hidden max_amount) or None if there are no bids.
+    Returns (outcome, row) where row is the single summarized bid row to write:
+      "bidder"    - the caller is the new leader
+      "leader"    - the existing maximum holds; its bid is raised just enough to stay ahead
+      "raise_max" - the caller already leads and only raised their maximum (row is the leader row)
+    Mirrors the logic in sql/place_bid_atomic.sql.
+    """
+    if bid.max_bid is not None and bid.max_bid < bid.bid_amount:
+        raise HTTPException(400, "Maximum bid cannot be lower than the bid amount")
+
+    current = leader["amount"] if leader else None
+    min_required = starting_bid if leader is None else current + min_increment
+    ceiling = max(bid.bid_amount, bid.max_bid or bid.bid_amount)
+
+    def bidder_row(amount, max_amount):
+        return {
+            "bidder_id": guest_bidder_id(bid.bidder_email),
+            "bidder_email": bid.bidder_email,
+            "bidder_name": bid.bidder_name,
+            "amount": amount,
+            "max_amount": max_amount if max_amount > amount else None,
+        }
+
+    if leader is None:
+        amount = max(bid.bid_amount, min_required)
+        if amount <= ceiling:
+            return "bidder", bidder_row(amount, ceiling)
+    elif leader["bidder_email"].lower() == bid.bidder_email.lower():
+        leader_ceiling = max(current, leader.get("max_amount") or 0)
+        if bid.bid_amount >= min_required:
+            return "bidder", bidder_row(bid.bid_amount, max(ceiling, leader.get("max_amount") or 0))
+        if ceiling > leader_ceiling:
+            return "raise_max", {**leader, "max_amount": ceiling}
+    elif ceiling >= min_required:
+        leader_ceiling = max(current, leader.get("max_amount") or 0)
+        if ceiling > leader_ceiling:
+            amount = max(bid.bid_amount, min(ceiling, leader_ceiling + min_increment))
+            return "bidder", bidder_row(amount, ceiling)
+        # earlier maximum wins ties; raise it just enough to beat the challenger
+        amount = min(leader_ceiling, ceiling + min_increment)
+        return "leader", {
+            "bidder_id": leader.get("bidder_id"),
+            "bidder_email": leader["bidder_email"],
+            "bidder_name": leader.get("bidder_name"),
+            "amount": amount,
+            "max_amount": leader_ceiling if leader_ceiling > amount else None,
+        }
+
+    if bid.expected_current_bid is not None and bid.expected_current_bid != current:
+        raise HTTPException(409, f"Bid is stale: another bid was accepted first. Bid must now be at least ${min_required:.2f}")
+    raise HTTPException(400, f"Bid must be at least ${min_required:.2f}")
+
+
+def public_bid(row: dict) -> dict:
+    """Strip hidden proxy maximums before a bid row is shown to anyone"""
+    return {k: v for k, v in row.items() if k != "max_amount"}
+
+
+def anonymous_bid(row: dict) -> dict:
+    """A bid as anonymous viewers see it: amount and time, no bidder identity"""
+    return {k: row.get(k) for k in ("bid_id", "item_id", "amount", "created_at")}
+
+
+def bid_response(outcome: str, row: dict, current_highest):
+    """Response body for a resolved bid; the caller only sees their own maximum"""
+    if outcome == "leader":
+        return {
+            "message": "You have been outbid by an existing maximum bid",
+            "outbid": True,
+            "bid": public_bid(row),
+            "current_highest": current_highest
+        }
+    return {
+        "message": "Maximum bid updated" if outcome == "raise_max" else "Bid placed successfully",
+        "outbid": False,
+        "bid": row,
+        "current_highest": current_highest
+    }
+
+
 # PLACE a bid on an item (or price guess for demo auctions)
-@app.post("/items/{item_id}/bid")
-def place_bid(item_id: str, bid: BidRequest):
-    """Place a bid on an item"""
+@app.post("/items/{item_id}/bid", dependencies=[Depends(admit_bid)])
+def place_bid(item_id: str, bid: BidRequest, response: Response, idempotency_key: Optional[str] = Header(None)):
+    """
+    Place a bid on an item.
+    Validation, insert and current_bid update happen in one round trip via the
+    place_bid_atomic RPC, which locks the item row so concurrent bids can't both win.
+    With BID_ENGINE_ENABLED the in-process bid engine validates the bid instead.
+    Retries carrying the same Idempotency-Key replay the original outcome.
+    """
+    return idempotent("bid", item_id, idempotency_key, bid, response, lambda: place_bid_once(item_id, bid))
+
+
+def place_bid_once(item_id: str, bid: BidRequest):
+    if BID_ENGINE_ENABLED:
+        return bid_engine.place(item_id, bid)
+
+    # the bidding window is checked by the RPC under the item lock; the
+    # scheduler's in-memory window may predate a change made by another process
+    try:
+        result = supabase.rpc("place_bid_atomic", {
+            "p_item_id": item_id,
+            "p_bidder_id": guest_bidder_id(bid.bidder_email),
+            "p_bidder_email": bid.bidder_email,
+            "p_bidder_name": bid.bidder_name,
+            "p_amount": bid.bid_amount,
+            "p_expected_current": bid.expected_current_bid,
+            "p_max_amount": bid.max_bid,
+        }).execute()
+    except APIError as e:
+        # function not deployed yet - fall back to the multi-query path
+        if e.code == "PGRST202":
+            return place_bid_legacy(item_id, bid)
+        raise HTTPException(500, f"Failed to place bid: {e.message}")
+
+    outcome = result.data or {}
+    status = outcome.get("status")
+
+    if status in BID_REJECTIONS:
+        code, message = BID_REJECTIONS[status]
+        raise HTTPException(code, message)
+    if status == "invalid":
+        raise HTTPException(400, "Maximum bid cannot be lower than the bid amount")
+    if status == "too_low":
+        raise HTTPException(400, f"Bid must be at least ${outcome['min_required']:.2f}")
+    if status == "stale":
+        raise HTTPException(409, f"Bid is stale: another bid was accepted first. Bid must now be at least ${outcome['min_required']:.2f}")
+    if status != "ok":
+        raise HTTPException(500, "Failed to place bid")
+
+    record_accepted_bid(outcome.get("auction_id"), item_id, outcome["outcome"], outcome["bid"], outcome["current_highest"])
+    return bid_response(outcome["outcome"], outcome["bid"], outcome["current_highest"])
+
+
+def place_bid_legacy(item_id: str, bid: BidRequest):
+    """Multi-query bid path, used only when the place_bid_atomic RPC is not installed"""
     # Get item and verify it exists
     item = supabase.table("items").select("*, auctions(*)").eq("item_id", item_id).execute()
     if not item.data:
@@ -1529,78 +4194,48 @@ def place_bid(item_id: str, bid: BidRequest):
     item_data = item.data[0]
     auction_data = item_data.get("auctions", {})
     
-    # Check auction is published
-    if auction_data.get("status") != "published":
-        raise HTTPException(400, "Auction is not active")
-    
-    # Check auction hasn't ended
-    from datetime import datetime
-    end_time = auction_data.get("end_time")
-    if end_time:
-        try:
-            end_dt = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-            if datetime.now(end_dt.tzinfo) > end_dt:
-                raise HTTPException(400, "Auction has ended")
-        except ValueError:
-            pass
+    # Check auction is published and inside its bidding window (from the row just read)
+    phase = row_phase(auction_data)
+    if phase in PHASE_REJECTIONS:
+        raise HTTPException(400, PHASE_REJECTIONS[phase])
     
     # Check item isn't sold
     if item_data.get("is_sold"):
         raise HTTPException(400, "Item has already been sold")
     
-    # Enforce minimum bid requirements
-    # Get current highest bid
-    current_bids = supabase.table("bids").select("*").eq("item_id", item_id).order("amount", desc=True).limit(1).execute()
+    # Get current leading bid (with its hidden proxy maximum)
+    current_bids = supabase.table("bids").select("*").eq("item_id", item_id).order("amount", desc=True).order("created_at").limit(1).execute()
+    leader = current_bids.data[0] if current_bids.data else None
     
     starting_bid = item_data.get("starting_bid", 0) or 0
     min_increment = item_data.get("min_increment", 1) or 1
     
-    # If there are existing bids, new bid must be higher than current + increment
-    # If no bids yet, allow bidding at exactly the starting bid
-    if current_bids.data:
-        current_highest = current_bids.data[0]["amount"]
-        min_required = current_highest + min_increment
+    # Resolve against any proxy maximum and write one summarized bid row
+    outcome, row = resolve_proxy_bid(leader, starting_bid, min_increment, bid)
+    if outcome == "raise_max":
+        bid_result = supabase.table("bids").update({"max_amount": row["max_amount"]}).eq("bid_id", leader["bid_id"]).execute()
     else:
-        # No bids yet - allow the starting bid amount
-        min_required = starting_bid
-    
-    if bid.bid_amount < min_required:
-        raise HTTPException(400, f"Bid must be at least ${min_required:.2f}")
-    
-    # Generate a UUID for guest bidders based on their email (consistent per email)
-    import hashlib
-    # Create a deterministic UUID from email so same bidder gets same ID
-    email_hash = hashlib.md5(bid.bidder_email.lower().encode()).hexdigest()
-    guest_bidder_id = f"{email_hash[:8]}-{email_hash[8:12]}-{email_hash[12:16]}-{email_hash[16:20]}-{email_hash[20:32]}"
-    
-    # Insert bid
-    bid_result = supabase.table("bids").insert({
-        "item_id": item_id,
-        "bidder_id": guest_bidder_id,
-        "bidder_email": bid.bidder_email,
-        "bidder_name": bid.bidder_name,
-        "amount": bid.bid_amount
-    }).execute()
+        bid_result = supabase.table("bids").insert({"item_id": item_id, **row}).execute()
     
     if not bid_result.data:
         raise HTTPException(500, "Failed to place bid")
     
     # Update item's current_bid
-    supabase.table("items").update({"current_bid": bid.bid_amount}).eq("item_id", item_id).execute()
+    if outcome != "raise_max":
+        supabase.table("items").update({"current_bid": row["amount"]}).eq("item_id", item_id).execute()
     
-    return {
-        "message": "Bid placed successfully",
-        "bid": bid_result.data[0],
-        "current_highest": bid.bid_amount
-    }
+    record_accepted_bid(item_data.get("auction_id"), item_id, outcome, bid_result.data[0], row["amount"])
+    return bid_response(outcome, bid_result.data[0], row["amount"])
 
 
 # BUY NOW - purchase item immediately
-@app.post("/items/{item_id}/buy-now")
-def buy_now(item_id: str, purchase: BuyNowRequest):
-    """Purchase an item at buy now price"""
-    from datetime import datetime, timezone
-    
+@app.post("/items/{item_id}/buy-now", dependencies=[Depends(admit_buy_now)])
+def buy_now(item_id: str, purchase: BuyNowRequest, response: Response, idempotency_key: Optional[str] = Header(None)):
+    """Purchase an item at buy now price (retries with the same Idempotency-Key replay the original outcome)"""
+    return idempotent("buy_now", item_id, idempotency_key, purchase, response, lambda: buy_now_once(item_id, purchase))
+
+
+def buy_now_once(item_id: str, purchase: BuyNowRequest):
     # Get item
     item = supabase.table("items").select("*, auctions(*)").eq("item_id", item_id).execute()
     if not item.data:
@@ -1641,6 +4276,12 @@ def buy_now(item_id: str, purchase: BuyNowRequest):
         "is_sold": True,
         "sold_at": datetime.now(timezone.utc).isoformat()
     }).eq("item_id", item_id).execute()
+    bid_engine.invalidate(item_id)
+    auction_events.publish(item_data.get("auction_id"), "buy_now", {
+        "item_id": item_id,
+        "amount": buy_now_price,
+    })
+    note_auction_change(item_data.get("auction_id"), {"type": "buy_now", "item_id": item_id, "amount": buy_now_price})
     
     return {
         "message": "Purchase successful",
@@ -1650,58 +4291,164 @@ def buy_now(item_id: str, purchase: BuyNowRequest):
 
 # GET bids for an item
 @app.get("/items/{item_id}/bids")
-def get_item_bids(item_id: str):
-    """Get all bids for an item"""
-    item = supabase.table("items").select("item_id").eq("item_id", item_id).execute()
-    if not item.data:
+def get_item_bids(
+    item_id: str,
+    request: Request,
+    response: Response,
+    since: str = None,
+    limit: int = None,
+    after: str = None,
+    top: int = None
+):
+    """
+    Get bids for an item, highest first (earlier bid first on equal amounts).
+    Keyset-paginated on (amount, created_at, bid_id): pass next_after back as after= for the next page.
+    limit sets the page size (default BIDS_PAGE_SIZE); top=N returns only the top N bids.
+    Pass the returned cursor as since= to get only bids placed after it.
+    Supports If-None-Match (304 when nothing changed).
+    """
+    auction_id = change_log.auction_for_item(item_id)
+    if auction_id is None:
         raise HTTPException(404, "Item not found")
     
-    bids = supabase.table("bids").select("*").eq("item_id", item_id).order("amount", desc=True).execute()
+    unchanged = not_modified(request, response, auction_id, f"item-{item_id}-{since or ''}-{limit}-{after or ''}-{top}")
+    if unchanged:
+        return unchanged
+    changes, cursor = change_log.since(auction_id, since)
+    if changes is not None:
+        new_bids = [c["bid"] for c in changes if c["type"] == "bid" and c["item_id"] == item_id]
+        return {"item_id": item_id, "cursor": cursor, "full": False, "bids": new_bids}
+    
+    if top is not None:
+        page_size = min(max(top, 1), BIDS_MAX_PAGE_SIZE)
+    else:
+        page_size = min(max(limit or BIDS_PAGE_SIZE, 1), BIDS_MAX_PAGE_SIZE)
+    
+    query = supabase.table("bids").select("*").eq("item_id", item_id)
+    if after and top is None:
+        amount, created_at, bid_id = decode_bid_key(after)
+        query = query.or_(
+            f'amount.lt.{amount},'
+            f'and(amount.eq.{amount},created_at.gt."{created_at}"),'
+            f'and(amount.eq.{amount},created_at.eq."{created_at}",bid_id.gt.{bid_id})'
+        )
+    # fetch one extra row to know whether another page exists; bid_id breaks
+    # (amount, created_at) ties so no row is skipped or repeated across pages
+    bids = query.order("amount", desc=True).order("created_at").order("bid_id").limit(page_size + 1).execute()
+    rows = bids.data or []
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
     
     return {
         "item_id": item_id,
-        "bids": bids.data if bids.data else []
+        "cursor": cursor,
+        "full": True,
+        "bids": [public_bid(b) for b in rows],
+        "next_after": encode_bid_key(rows[-1]) if has_more and top is None else None
     }
 
 
+def encode_bid_key(bid: dict) -> str:
+    """Opaque keyset position for a bid row"""
+    return base64.urlsafe_b64encode(f"{bid['amount']}|{bid['created_at']}|{bid['bid_id']}".encode()).decode()
+
+
+def decode_bid_key(key: str):
+    try:
+        amount, created_at, bid_id = base64.urlsafe_b64decode(key.encode()).decode().split("|", 2)
+        amount, bid_id = float(amount), str(uuid.UUID(bid_id))
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(400, "Invalid after cursor")
+    # the values are spliced into a PostgREST filter, so reject anything that isn't a timestamp
+    if parse_timestamp(created_at) is None:
+        raise HTTPException(400, "Invalid after cursor")
+    return amount, created_at, bid_id
+
+
 # GET all bids for an auction (for seller bid tracking)
 @app.get("/auctions/{auction_id}/all-bids")
-def get_auction_bids(auction_id: str):
-    """Get all bids for all items in an auction - for seller to track bidding"""
-    # Verify auction exists
-    auction = supabase.table("auctions").select("auction_id, auction_name, status").eq("auction_id", auction_id).execute()
+def get_auction_bids(auction_id: str, request: Request, response: Response, include_bids: bool = False, since: str = None):
+    """
+    Get bid summaries (highest bid, bid count, last bid time) for all items in an auction.
+    Pass include_bids=true to also get every item's full bid list, fetched in one batched query.
+    Pass the returned cursor as since= to get only the changes after it.
+    Supports If-None-Match (304 when nothing changed).
+    """
+    unchanged = not_modified(request, response, auction_id, f"bids{int(include_bids)}-{since or ''}")
+    if unchanged:
+        return unchanged
+    changes, cursor = change_log.since(auction_id, since)
+    if changes is not None:
+        return {"auction_id": auction_id, "cursor": cursor, "full": False, "changes": changes}
+    
+    version = change_log.version(auction_id)
+    if FAST_JSON:
+        # coalesced callers share the serialized and compressed payload too
+        payload = single_flight.do(
+            ("auction_bids", auction_id, include_bids, version),
+            lambda: EncodedPayload(dumps(build_auction_bids(auction_id, include_bids, cursor)))
+        )
+        return payload_response(payload, request, {"ETag": response.headers["ETag"]})
+    return single_flight.do(
+        ("auction_bids", auction_id, include_bids, version),
+        lambda: build_auction_bids(auction_id, include_bids, cursor)
+    )
+
+
+def build_auction_bids(auction_id: str, include_bids: bool, cursor: str) -> dict:
+    """Assemble the seller bid tracking payload for an auction"""
+    # Auction and its items in one round trip (use 'title' not 'name')
+    auction = supabase.table("auctions").select(
+        "auction_id, auction_name, status, items(item_id, title, starting_bid, min_increment, is_sold, buy_now_price, is_listed)"
+    ).eq("auction_id", auction_id).execute()
     if not auction.data:
         raise HTTPException(404, "Auction not found")
     
-    # Get all items for this auction (use 'title' not 'name')
-    items = supabase.table("items").select("item_id, title, starting_bid, min_increment, is_sold, buy_now_price, is_listed").eq("auction_id", auction_id).execute()
+    auction_data = auction.data[0]
+    items_data = auction_data.pop("items", None) or []
+    if not items_data:
+        return {"auction": auction_data, "cursor": cursor, "full": True, "items_with_bids": []}
+    
+    item_ids = [item["item_id"] for item in items_data]
+    for iid in item_ids:
+        change_log.remember_item(iid, auction_id)
+    summaries = bid_summaries.get_many(item_ids)
     
-    if not items.data:
-        return {"auction": auction.data[0], "items_with_bids": []}
+    bids_by_item = {}
+    if include_bids:
+        for chunk in chunked(item_ids):
+            bids = iter_pages(lambda: supabase.table("bids").select("*").in_("item_id", chunk)
+                              .order("item_id").order("amount", desc=True).order("created_at").order("bid_id"))
+            for b in bids:
+                bids_by_item.setdefault(b["item_id"], []).append(public_bid(b))
     
     items_with_bids = []
-    for item in items.data:
-        # Get bids for this item
-        bids = supabase.table("bids").select("*").eq("item_id", item["item_id"]).order("amount", desc=True).execute()
-        items_with_bids.append({
+    for item in items_data:
+        summary = summaries[item["item_id"]]
+        entry = {
             **item,
             "name": item.get("title", "Untitled"),  # Map title to name for frontend
-            "bids": bids.data if bids.data else [],
-            "bid_count": len(bids.data) if bids.data else 0,
-            "highest_bid": bids.data[0]["amount"] if bids.data else None
-        })
+            "bid_count": summary["bid_count"],
+            "highest_bid": summary["highest_bid"],
+            "last_bid_at": summary["last_bid_at"]
+        }
+        if include_bids:
+            entry["bids"] = bids_by_item.get(item["item_id"], [])
+        items_with_bids.append(entry)
     
     return {
-        "auction": auction.data[0],
+        "auction": auction_data,
+        "cursor": cursor,
+        "full": True,
         "items_with_bids": items_with_bids
     }
 
 
 # GET single order
 @app.get("/orders/{order_id}")
-def get_order(order_id: str):
+async def get_order(order_id: str):
     """Get order details"""
-    order = supabase.table("orders").select("*, items(*)").eq("order_id", order_id).execute()
+    order = await async_db.table("orders").select("*, items(*)").eq("order_id", order_id).execute()
     if not order.data:
         raise HTTPException(404, "Order not found")
     
@@ -1710,20 +4457,264 @@ def get_order(order_id: str):
 
 # GET orders for a user (by email)
 @app.get("/orders")
-def list_orders(buyer_email: str = None, auction_id: str = None):
+async def list_orders(buyer_email: str = None, auction_id: str = None):
     """List orders by buyer email or auction"""
-    query = supabase.table("orders").select("*, items(*)")
+    query = async_db.table("orders").select("*, items(*)")
     
     if buyer_email:
         query = query.eq("buyer_email", buyer_email)
     if auction_id:
         query = query.eq("auction_id", auction_id)
     
-    orders = query.order("created_at", desc=True).execute()
+    orders = await query.order("created_at", desc=True).execute()
     
     return {"orders": orders.data if orders.data else []}
 
 
+# ============================================
+# ANALYTICS EXPORTS (CSV / PARQUET)
+# ============================================
+# Flat, typed exports of orders, bids and items for reconciliation, filtered by
+# auction and/or a created_at range. Rows are read in keyset-paginated chunks
+# on (created_at, primary key) with narrow column lists (no embedded items(*)),
+# and each chunk is written out before the next is fetched: CSV as text, and
+# Parquet as one row group per chunk when pyarrow is installed.
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# column -> type (string, int, float, bool, timestamp) per dataset, in output order
+EXPORT_DATASETS = {
+    "orders": ("order_id", {
+        "order_id": "string",
+        "auction_id": "string",
+        "item_id": "string",
+        "buyer_id": "string",
+        "buyer_email": "string",
+        "buyer_name": "string",
+        "amount": "float",
+        "order_type": "string",
+        "created_at": "timestamp",
+    }),
+    "bids": ("bid_id", {
+        "bid_id": "string",
+        "item_id": "string",
+        "bidder_id": "string",
+        "bidder_email": "string",
+        "bidder_name": "string",
+        "amount": "float",
+        "created_at": "timestamp",
+    }),
+    "items": ("item_id", {
+        "item_id": "string",
+        "auction_id": "string",
+        "title": "string",
+        "brand": "string",
+        "model": "string",
+        "year": "int",
+        "starting_bid": "float",
+        "min_increment": "float",
+        "buy_now_price": "float",
+        "current_bid": "float",
+        "is_listed": "bool",
+        "is_sold": "bool",
+        "sold_at": "timestamp",
+        "created_at": "timestamp",
+    }),
+}
+
+
+def coerce_export_value(value, kind: str):
+    """Convert a PostgREST value to the export column type; None if missing or unparseable"""
+    if value is None or value == "":
+        return None
+    try:
+        if kind == "float":
+            return float(value)
+        if kind == "int":
+            return int(float(value))
+    except (TypeError, ValueError):
+        return None
+    if kind == "bool":
+        return value if isinstance(value, bool) else str(value).lower() in ("true", "t", "1")
+    if kind == "timestamp":
+        parsed = parse_timestamp(value) if isinstance(value, str) else None
+        return parsed.astimezone(timezone.utc) if parsed else None
+    return str(value)
+
+
+def iter_export_chunks(dataset: str, auction_id: str = None, start: str = None, end: str = None):
+    """Yield lists of rows for a dataset, keyset-paginated on (created_at, primary key)"""
+    key, columns = EXPORT_DATASETS[dataset]
+
+    def keyset(apply_filters):
+        after = None
+        while True:
+            query = apply_filters(supabase.table(dataset).select(", ".join(columns)))
+            if start:
+                query = query.gte("created_at", start)
+            if end:
+                query = query.lt("created_at", end)
+            if after:
+                created_at, last_key = after
+                query = query.or_(f'created_at.gt."{created_at}",and(created_at.eq."{created_at}",{key}.gt.{last_key})')
+            rows = query.order("created_at").order(key).limit(EXPORT_PAGE_SIZE).execute().data or []
+            if rows:
+                yield rows
+            if len(rows) < EXPORT_PAGE_SIZE:
+                return
+            after = (rows[-1]["created_at"], rows[-1][key])
+
+    if dataset == "bids" and auction_id:
+        # bids carry no auction_id: walk the auction's items and export their bids chunk by chunk
+        item_ids = [item["item_id"] for item in iter_pages(
+            lambda: supabase.table("items").select("item_id").eq("auction_id", auction_id).order("item_id")
+        )]
+        for chunk in chunked(item_ids):
+            yield from keyset(lambda query: query.in_("item_id", chunk))
+    elif auction_id:
+        yield from keyset(lambda query: query.eq("auction_id", auction_id))
+    else:
+        yield from keyset(lambda query: query)
+
+
+def stream_export_csv(chunks, columns: dict):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(list(columns))
+    for rows in chunks:
+        for row in rows:
+            values = []
+            for column, kind in columns.items():
+                value = coerce_export_value(row.get(column), kind)
+                if value is None:
+                    values.append("")
+                elif kind == "bool":
+                    values.append("true" if value else "false")
+                elif kind == "timestamp":
+                    values.append(value.isoformat())
+                else:
+                    values.append(value)
+            writer.writerow(values)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class ParquetChunkSink:
+    """Write-only file object that hands back whatever pyarrow has written since the last drain"""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts.clear()
+        return data
+
+
+def stream_export_parquet(chunks, columns: dict):
+    types = {"string": pa.string(), "int": pa.int64(), "float": pa.float64(), "bool": pa.bool_(),
+             "timestamp": pa.timestamp("us", tz="UTC")}
+    schema = pa.schema([(column, types[kind]) for column, kind in columns.items()])
+    sink = ParquetChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for rows in chunks:
+            table = pa.Table.from_pydict({
+                column: [coerce_export_value(row.get(column), kind) for row in rows]
+                for column, kind in columns.items()
+            }, schema=schema)
+            writer.write_table(table)
+            if data := sink.drain():
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+# GET orders, bids or items as CSV or Parquet for analytics
+@app.get("/exports/{dataset}")
+def export_dataset(dataset: str, format: str = "csv", auction_id: str = None, start: str = None, end: str = None):
+    """
+    Stream a typed, flat export of orders, bids or items.
+    Filter by auction_id and/or a created_at range (start inclusive, end exclusive, ISO timestamps).
+    """
+    if dataset not in EXPORT_DATASETS:
+        raise HTTPException(404, f"Unknown export '{dataset}' (expected one of: {', '.join(EXPORT_DATASETS)})")
+    if format not in ("csv", "parquet"):
+        raise HTTPException(400, "format must be csv or parquet")
+    if format == "parquet" and pa is None:
+        raise HTTPException(501, "Parquet export requires pyarrow to be installed")
+
+    bounds = {}
+    for name, value in (("start", start), ("end", end)):
+        if value:
+            parsed = parse_timestamp(value)
+            if parsed is None:
+                raise HTTPException(400, f"Invalid {name} timestamp")
+            bounds[name] = parsed.isoformat()
+
+    if auction_id:
+        auction = supabase.table("auctions").select("auction_id").eq("auction_id", auction_id).execute()
+        if not auction.data:
+            raise HTTPException(404, "Auction not found")
+
+    columns = EXPORT_DATASETS[dataset][1]
+    chunks = iter_export_chunks(dataset, auction_id, bounds.get("start"), bounds.get("end"))
+    filename = f"{dataset}-{auction_id or 'all'}.{format}"
+    if format == "csv":
+        body, media_type = stream_export_csv(chunks, columns), "text/csv; charset=utf-8"
+    else:
+        body, media_type = stream_export_parquet(chunks, columns), "application/vnd.apache.parquet"
+    return StreamingResponse(body, media_type=media_type,
+                             headers={"Content-Disposition": f"attachment; filename=\"{filename}\""})
+
+
+# ============================================
+# METRICS
+# ============================================
+
+@app.get("/metrics")
+def get_metrics():
+    """In-process performance counters for monitoring"""
+    return {
+        "single_flight": single_flight.stats(),
+        "public_auction_cache": public_auction_cache.stats(),
+        "auction_events": auction_events.stats(),
+        "bid_engine": bid_engine.stats(),
+        "admission": {scope: limiter.counters for scope, limiter in admission_limiters.items()},
+        "idempotency": idempotency_store.stats(),
+        "auction_scheduler": auction_lifecycle.stats(),
+        "jobs": jobs.stats(),
+        "profile_cache": {"profiles": profile_status_cache.stats(), "auction_owners": auction_owner_cache.stats()},
+        "entity_cache": entity_cache.stats(),
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8081))
@@ -0,0 +1,22 @@
+-- bid_summaries: highest bid, bid count and last bid time for a set of items.
+--
+-- Called from BidSummaryStore in main.py via supabase.rpc("bid_summaries", ...)
+-- to seed per-item summaries in one round trip; the ids travel in the request
+-- body, so large auctions don't hit URL length limits.
+
+-- also serves the (amount desc, created_at, bid_id) keyset pagination of /items/{item_id}/bids;
+-- it covers the older indexes, so drop them rather than pay for both on every bid insert
+drop index if exists bids_item_id_amount_idx;
+drop index if exists bids_item_amount_created_idx;
+create index if not exists bids_item_amount_created_bid_idx on bids (item_id, amount desc, created_at, bid_id);
+
+create or replace function bid_summaries(p_item_ids uuid[])
+returns table (item_id uuid, highest_bid numeric, bid_count bigint, last_bid_at timestamptz)
+language sql
+stable
+as $$
+    select b.item_id, max(b.amount), count(*), max(b.created_at)
+    from bids b
+    where b.item_id = any(p_item_ids)
+    group by b.item_id;
+$$;
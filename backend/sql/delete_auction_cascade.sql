@@ -0,0 +1,48 @@
+-- delete_auction_cascade: delete an auction and everything that hangs off it in one transaction.
+--
+-- Called from the background job started by DELETE /auctions/{auction_id} via
+-- supabase.rpc("delete_auction_cascade", ...). Mirrors delete_auction_data()
+-- in main.py. Every delete is set-based over all of the auction's items, and
+-- either all of them happen or none do, so no orphaned rows are left behind.
+--
+-- Returns a jsonb object with the number of rows deleted per table
+-- ("bids", "orders", "comps", "item_images", "items", "auctions").
+
+create or replace function delete_auction_cascade(p_auction_id uuid) returns jsonb
+language plpgsql
+as $$
+declare
+    v_item_ids uuid[];
+    v_bids integer;
+    v_orders integer;
+    v_comps integer;
+    v_images integer;
+    v_items integer;
+    v_auctions integer;
+begin
+    select coalesce(array_agg(item_id), '{}') into v_item_ids
+    from items where auction_id = p_auction_id;
+
+    delete from bids where item_id = any(v_item_ids);
+    get diagnostics v_bids = row_count;
+    delete from orders where item_id = any(v_item_ids) or auction_id = p_auction_id;
+    get diagnostics v_orders = row_count;
+    delete from comps where item_id = any(v_item_ids);
+    get diagnostics v_comps = row_count;
+    delete from item_images where item_id = any(v_item_ids);
+    get diagnostics v_images = row_count;
+    delete from items where auction_id = p_auction_id;
+    get diagnostics v_items = row_count;
+    delete from auctions where auction_id = p_auction_id;
+    get diagnostics v_auctions = row_count;
+
+    return jsonb_build_object(
+        'bids', v_bids,
+        'orders', v_orders,
+        'comps', v_comps,
+        'item_images', v_images,
+        'items', v_items,
+        'auctions', v_auctions
+    );
+end;
+$$;
@@ -0,0 +1,19 @@
+-- item_price_stats: materialized price statistics per item, computed from its comps.
+--
+-- Written by PricingStatsStore in main.py whenever an item's comps are saved
+-- (and by POST /auctions/{auction_id}/pricing/refresh), read by GET /items
+-- for price_stats and suggested_starting_price. Without this table the stats
+-- are computed and kept in memory only.
+
+create table if not exists item_price_stats (
+    item_id uuid primary key references items (item_id) on delete cascade,
+    comp_count integer not null,
+    mean numeric not null,
+    median numeric not null,
+    trimmed_mean numeric not null,   -- lowest and highest 10% of comps dropped
+    p25 numeric not null,
+    p75 numeric not null,
+    estimate numeric not null,       -- mean of comps within 3 robust deviations of the median
+    suggested_starting_price integer not null,
+    updated_at timestamptz not null default now()
+);
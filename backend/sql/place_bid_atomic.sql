@@ -0,0 +1,165 @@
+-- place_bid_atomic: validate, resolve proxy bids and record a bid in a single round trip.
+--
+-- Called from POST /items/{item_id}/bid via supabase.rpc("place_bid_atomic", ...).
+-- The item row is locked for the duration of the call, so two concurrent bids
+-- on the same item are serialized and can never both pass the minimum check.
+--
+-- Proxy bidding: bids.max_amount holds the leading bidder's hidden maximum.
+-- An incoming bid (with an optional p_max_amount) is resolved against it in one
+-- pass, and only one summarized bid row is written for the resulting leader.
+-- Mirrors resolve_proxy_bid() in main.py (covered by tests/test_proxy_bidding.py).
+--
+-- Returns a jsonb object with a "status" key:
+--   ok         -> bid resolved ("outcome", "bid", "auction_id", "current_highest")
+--                 outcome: bidder    -> caller is the new leader
+--                          leader    -> existing proxy bid holds and was raised
+--                          raise_max -> caller already leads; maximum raised
+--   not_found  -> item does not exist
+--   inactive   -> auction is not published
+--   not_started -> auction start_time has not been reached
+--   ended      -> auction end_time has passed
+--   sold       -> item already sold
+--   invalid    -> p_max_amount is lower than p_amount
+--   too_low    -> amount below the minimum ("min_required", "current_highest")
+--   stale      -> amount below the minimum because the caller's expected
+--                 current bid is out of date ("min_required", "current_highest")
+
+alter table bids add column if not exists max_amount numeric;
+
+drop function if exists place_bid_atomic(uuid, uuid, text, text, numeric, numeric);
+
+create or replace function place_bid_atomic(
+    p_item_id uuid,
+    p_bidder_id uuid,
+    p_bidder_email text,
+    p_bidder_name text,
+    p_amount numeric,
+    p_expected_current numeric default null,
+    p_max_amount numeric default null
+) returns jsonb
+language plpgsql
+as $$
+declare
+    v_item items%rowtype;
+    v_auction auctions%rowtype;
+    v_leader bids%rowtype;
+    v_has_leader boolean;
+    v_increment numeric;
+    v_min_required numeric;
+    v_ceiling numeric;
+    v_leader_ceiling numeric;
+    v_amount numeric;
+    v_outcome text;
+    v_bid bids%rowtype;
+begin
+    if p_max_amount is not null and p_max_amount < p_amount then
+        return jsonb_build_object('status', 'invalid');
+    end if;
+
+    -- lock the item row: this is the compare-and-set point for the bid
+    select * into v_item from items where item_id = p_item_id for update;
+    if not found then
+        return jsonb_build_object('status', 'not_found');
+    end if;
+
+    select * into v_auction from auctions where auction_id = v_item.auction_id;
+    if v_auction.status is distinct from 'published' then
+        return jsonb_build_object('status', 'inactive');
+    end if;
+    if v_auction.start_time is not null and now() < v_auction.start_time then
+        return jsonb_build_object('status', 'not_started');
+    end if;
+    if v_auction.end_time is not null and now() > v_auction.end_time then
+        return jsonb_build_object('status', 'ended');
+    end if;
+    if coalesce(v_item.is_sold, false) then
+        return jsonb_build_object('status', 'sold');
+    end if;
+
+    select * into v_leader from bids
+    where item_id = p_item_id
+    order by amount desc, created_at asc
+    limit 1;
+    v_has_leader := found;
+
+    v_increment := coalesce(nullif(v_item.min_increment, 0), 1);
+    -- no bids yet: the starting bid itself is allowed
+    if not v_has_leader then
+        v_min_required := coalesce(v_item.starting_bid, 0);
+    else
+        v_min_required := v_leader.amount + v_increment;
+    end if;
+    v_ceiling := greatest(p_amount, coalesce(p_max_amount, p_amount));
+
+    if not v_has_leader then
+        v_outcome := 'bidder';
+        v_amount := greatest(p_amount, v_min_required);
+    elsif lower(v_leader.bidder_email) = lower(p_bidder_email) then
+        if p_amount >= v_min_required then
+            v_outcome := 'bidder';
+            v_amount := p_amount;
+            v_ceiling := greatest(v_ceiling, coalesce(v_leader.max_amount, 0));
+        elsif v_ceiling > greatest(v_leader.amount, coalesce(v_leader.max_amount, 0)) then
+            v_outcome := 'raise_max';
+        end if;
+    elsif v_ceiling >= v_min_required then
+        v_leader_ceiling := greatest(v_leader.amount, coalesce(v_leader.max_amount, 0));
+        if v_ceiling > v_leader_ceiling then
+            v_outcome := 'bidder';
+            v_amount := greatest(p_amount, least(v_ceiling, v_leader_ceiling + v_increment));
+        else
+            -- earlier maximum wins ties; raise it just enough to beat the challenger
+            v_outcome := 'leader';
+            v_amount := least(v_leader_ceiling, v_ceiling + v_increment);
+        end if;
+    end if;
+
+    if v_outcome is null or (v_outcome = 'bidder' and v_amount < v_min_required) then
+        return jsonb_build_object(
+            'status',
+            case
+                when p_expected_current is not null
+                     and v_leader.amount is distinct from p_expected_current then 'stale'
+                else 'too_low'
+            end,
+            'min_required', v_min_required,
+            'current_highest', v_leader.amount
+        );
+    end if;
+
+    if v_outcome = 'raise_max' then
+        update bids set max_amount = v_ceiling
+        where bid_id = v_leader.bid_id
+        returning * into v_bid;
+        return jsonb_build_object(
+            'status', 'ok',
+            'outcome', v_outcome,
+            'bid', to_jsonb(v_bid),
+            'auction_id', v_item.auction_id,
+            'current_highest', v_leader.amount
+        );
+    end if;
+
+    if v_outcome = 'bidder' then
+        insert into bids (item_id, bidder_id, bidder_email, bidder_name, amount, max_amount)
+        values (p_item_id, p_bidder_id, p_bidder_email, p_bidder_name, v_amount,
+                case when v_ceiling > v_amount then v_ceiling end)
+        returning * into v_bid;
+    else
+        insert into bids (item_id, bidder_id, bidder_email, bidder_name, amount, max_amount)
+        values (p_item_id, v_leader.bidder_id, v_leader.bidder_email, v_leader.bidder_name, v_amount,
+                case when v_leader_ceiling > v_amount then v_leader_ceiling end)
+        returning * into v_bid;
+    end if;
+
+    update items set current_bid = v_amount where item_id = p_item_id;
+
+    return jsonb_build_object(
+        'status', 'ok',
+        'outcome', v_outcome,
+        'bid', to_jsonb(v_bid),
+        'auction_id', v_item.auction_id,
+        'current_highest', v_amount
+    );
+end;
+$$;
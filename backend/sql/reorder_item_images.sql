@@ -0,0 +1,35 @@
+-- reorder_item_images: set the position of every image of an item in one call.
+--
+-- Called from PUT /items/{item_id}/images/order and
+-- PUT /items/{item_id}/images/{image_id}/primary via
+-- supabase.rpc("reorder_item_images", ...). p_image_ids lists all of the
+-- item's images in the desired order; image n gets position n.
+-- Positions are first moved out of the way (negated) and then set, inside one
+-- transaction, so a unique (item_id, position) constraint never sees duplicates
+-- and a failure leaves the old order untouched. If p_image_ids is not exactly
+-- the item's image ids the function raises (SQLSTATE 22023) before writing.
+--
+-- Returns the item's images in their new order.
+
+create or replace function reorder_item_images(p_item_id uuid, p_image_ids bigint[])
+returns setof item_images
+language plpgsql
+as $$
+begin
+    if (select coalesce(array_agg(image_id::bigint order by image_id), '{}') from item_images where item_id = p_item_id)
+       is distinct from
+       (select coalesce(array_agg(id order by id), '{}') from unnest(p_image_ids) as t(id)) then
+        raise exception 'p_image_ids must list every image of item % exactly once', p_item_id
+            using errcode = '22023';
+    end if;
+
+    update item_images set position = -position
+    where item_id = p_item_id;
+
+    return query
+    update item_images i set position = o.ord
+    from unnest(p_image_ids) with ordinality as o(image_id, ord)
+    where i.item_id = p_item_id and i.image_id = o.image_id
+    returning i.*;
+end;
+$$;
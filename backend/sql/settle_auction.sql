@@ -0,0 +1,63 @@
+-- settle_auction: create the winning orders for a closed auction in one statement.
+--
+-- Called from the settlement job started by POST /auctions/{auction_id}/close
+-- (and the scheduler's auto-close, or POST /auctions/{auction_id}/settle) via
+-- supabase.rpc("settle_auction", ...). Mirrors settle_auction_fallback() in main.py.
+--
+-- For every listed, unsold item the highest bid (earliest on ties) wins: one
+-- orders row is inserted per winner and the items are marked sold in one
+-- update. Items that are already sold or already have an order are skipped,
+-- so running it again is a no-op.
+--
+-- Returns a jsonb object:
+--   items_considered   -> listed, unsold items in the auction
+--   orders_created     -> winning orders inserted by this call
+--   items_without_bids -> considered items left unsold
+--   sold_item_ids      -> items marked sold by this call
+
+create or replace function settle_auction(p_auction_id uuid) returns jsonb
+language plpgsql
+as $$
+declare
+    v_considered integer;
+    v_sold uuid[];
+begin
+    select count(*) into v_considered
+    from items
+    where auction_id = p_auction_id
+      and coalesce(is_listed, false)
+      and not coalesce(is_sold, false);
+
+    with winners as (
+        select distinct on (b.item_id)
+               b.item_id, b.bidder_id, b.bidder_email, b.bidder_name, b.amount
+        from bids b
+        join items i on i.item_id = b.item_id
+        where i.auction_id = p_auction_id
+          and coalesce(i.is_listed, false)
+          and not coalesce(i.is_sold, false)
+          and not exists (select 1 from orders o where o.item_id = b.item_id)
+        order by b.item_id, b.amount desc, b.created_at asc
+    ), inserted as (
+        insert into orders (item_id, auction_id, buyer_id, buyer_email, buyer_name, amount, order_type)
+        select item_id, p_auction_id,
+               coalesce(bidder_id, '00000000-0000-0000-0000-000000000000'::uuid),
+               bidder_email, bidder_name, amount, 'auction_win'
+        from winners
+        returning item_id
+    ), sold as (
+        update items set is_sold = true, sold_at = now()
+        from inserted
+        where items.item_id = inserted.item_id
+        returning items.item_id
+    )
+    select coalesce(array_agg(item_id), '{}') into v_sold from sold;
+
+    return jsonb_build_object(
+        'items_considered', v_considered,
+        'orders_created', coalesce(array_length(v_sold, 1), 0),
+        'items_without_bids', v_considered - coalesce(array_length(v_sold, 1), 0),
+        'sold_item_ids', to_jsonb(v_sold)
+    );
+end;
+$$;
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# main.py builds its Supabase client at import time; the unit tests never reach the network
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.test")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
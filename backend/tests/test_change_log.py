@@ -0,0 +1,103 @@
+"""
+Delta cursors of AuctionChangeLog.since(): a cursor is "epoch.version.full_at",
+and anything the log can't answer exactly sends the client back to a full fetch.
+"""
+import pytest
+
+import main
+from main import AuctionChangeLog
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(main.time, "time", lambda: now[0])
+    return now
+
+
+def bid(n):
+    return {"type": "bid", "item_id": "i1", "bid": {"bid_id": f"b{n}", "amount": n}}
+
+
+def test_no_cursor_means_full_fetch(clock):
+    log = AuctionChangeLog(size=10, max_auctions=10, max_age=10)
+    log.record("a1", bid(1))
+    changes, cursor = log.since("a1", None)
+    assert changes is None
+    assert cursor == f"{log.epoch}.1.{int(clock[0])}"
+
+
+def test_returns_changes_after_the_cursor_and_keeps_full_at(clock):
+    log = AuctionChangeLog(size=10, max_auctions=10, max_age=10)
+    _, cursor = log.since("a1", None)
+    log.record("a1", bid(1))
+    log.record("a1", bid(2))
+    clock[0] += 5
+    changes, new_cursor = log.since("a1", cursor)
+    assert [c["bid"]["amount"] for c in changes] == [1, 2]
+    # a delta moves the version on but not the time of the last full fetch
+    assert new_cursor == f"{log.epoch}.2.{int(clock[0]) - 5}"
+    assert log.since("a1", new_cursor) == ([], new_cursor)
+
+
+def test_cursor_from_another_process_forces_full_fetch(clock):
+    log = AuctionChangeLog(size=10, max_auctions=10, max_age=10)
+    other = AuctionChangeLog(size=10, max_auctions=10, max_age=10)
+    _, cursor = other.since("a1", None)
+    assert log.since("a1", cursor)[0] is None
+
+
+@pytest.mark.parametrize("cursor", ["garbage", "x.1", "{epoch}.one.1", "{epoch}.5.{now}"])
+def test_malformed_or_future_cursor_forces_full_fetch(clock, cursor):
+    log = AuctionChangeLog(size=10, max_auctions=10, max_age=10)
+    log.record("a1", bid(1))
+    cursor = cursor.format(epoch=log.epoch, now=int(clock[0]))
+    assert log.since("a1", cursor)[0] is None
+
+
+def test_cursor_older_than_max_age_forces_full_fetch(clock):
+    log = AuctionChangeLog(size=10, max_auctions=10, max_age=10)
+    _, cursor = log.since("a1", None)
+    clock[0] += 10
+    assert log.since("a1", cursor)[0] == []
+    clock[0] += 1
+    changes, new_cursor = log.since("a1", cursor)
+    assert changes is None
+    assert new_cursor.endswith(f".{int(clock[0])}")
+
+
+def test_max_age_zero_trusts_cursors_forever(clock):
+    log = AuctionChangeLog(size=10, max_auctions=10, max_age=0)
+    _, cursor = log.since("a1", None)
+    clock[0] += 86400
+    assert log.since("a1", cursor)[0] == []
+
+
+def test_reset_in_between_forces_full_fetch(clock):
+    log = AuctionChangeLog(size=10, max_auctions=10, max_age=10)
+    _, cursor = log.since("a1", None)
+    log.record("a1", bid(1))
+    log.record("a1", {"type": "reset"})
+    log.record("a1", bid(2))
+    changes, new_cursor = log.since("a1", cursor)
+    assert changes is None
+    assert new_cursor == f"{log.epoch}.3.{int(clock[0])}"
+
+
+def test_gap_after_log_overflow_forces_full_fetch(clock):
+    log = AuctionChangeLog(size=2, max_auctions=10, max_age=10)
+    _, cursor = log.since("a1", None)
+    for n in range(1, 4):
+        log.record("a1", bid(n))
+    # version 1 fell out of the log, so changes after version 0 can't be replayed
+    assert log.since("a1", cursor)[0] is None
+    assert [c["bid"]["amount"] for c in log.since("a1", f"{log.epoch}.1.{int(clock[0])}")[0]] == [2, 3]
+
+
+def test_evicted_auction_log_forces_full_fetch(clock):
+    log = AuctionChangeLog(size=10, max_auctions=1, max_age=10)
+    _, cursor = log.since("a1", None)
+    log.record("a1", bid(1))
+    log.record("a2", bid(2))  # evicts a1's log, its version is kept
+    assert log.version("a1") == 1
+    assert log.since("a1", cursor)[0] is None
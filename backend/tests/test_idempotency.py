@@ -0,0 +1,157 @@
+"""
+IdempotencyStore.run(): one execution per key, replays of the stored outcome,
+and retries of server errors.
+"""
+import threading
+
+import pytest
+from fastapi import HTTPException, Response
+
+import main
+from main import IdempotencyStore
+
+KEY = ("bid", "item-1", "key-1")
+
+
+def store():
+    return IdempotencyStore(ttl=60, max_keys=100)
+
+
+def test_replay_returns_the_stored_body_without_running_again():
+    s = store()
+    calls = []
+    first = s.run(KEY, "fp", Response(), lambda: calls.append(1) or {"ok": 1})
+    replay_response = Response()
+    again = s.run(KEY, "fp", replay_response, lambda: calls.append(2) or {"ok": 2})
+    assert first == again == {"ok": 1}
+    assert calls == [1]
+    assert replay_response.headers["Idempotent-Replayed"] == "true"
+    assert s.is_replay(KEY)
+
+
+def test_same_key_with_a_different_body_is_rejected():
+    s = store()
+    s.run(KEY, "fp", Response(), lambda: {"ok": 1})
+    with pytest.raises(HTTPException) as e:
+        s.run(KEY, "other", Response(), lambda: {"ok": 2})
+    assert e.value.status_code == 422
+    assert s.counters["conflicts"] == 1
+
+
+def test_client_errors_are_replayed():
+    s = store()
+
+    def reject():
+        raise HTTPException(400, "Bid too low")
+
+    with pytest.raises(HTTPException):
+        s.run(KEY, "fp", Response(), reject)
+    with pytest.raises(HTTPException) as e:
+        s.run(KEY, "fp", Response(), lambda: {"ok": 1})
+    assert (e.value.status_code, e.value.detail) == (400, "Bid too low")
+
+
+@pytest.mark.parametrize("error", [HTTPException(503, "busy"), RuntimeError("boom")])
+def test_server_errors_are_dropped_so_a_retry_runs_again(error):
+    s = store()
+
+    def fail():
+        raise error
+
+    with pytest.raises(type(error)):
+        s.run(KEY, "fp", Response(), fail)
+    assert not s.is_replay(KEY)
+    assert s.run(KEY, "fp", Response(), lambda: {"ok": 1}) == {"ok": 1}
+    assert s.counters["executed"] == 2
+
+
+def start_original(s, fn):
+    """Start running fn under KEY on a thread, held until release is set"""
+    started, release, waiting = threading.Event(), threading.Event(), threading.Event()
+    outcome = []
+
+    def body():
+        started.set()
+        release.wait(5)
+        return fn()
+
+    def run():
+        try:
+            outcome.append(s.run(KEY, "fp", Response(), body))
+        except HTTPException as e:
+            outcome.append(e.status_code)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    started.wait(5)
+    # let the test know when a retry is blocked on the original
+    entry = s.entries[KEY]
+    wait = entry.done.wait
+    entry.done.wait = lambda timeout=None: waiting.set() or wait(timeout)
+    return thread, release, waiting, outcome
+
+
+def retry(s, results):
+    try:
+        results.append(s.run(KEY, "fp", Response(), lambda: {"ok": 2}))
+    except HTTPException as e:
+        results.append(e.status_code)
+
+
+def test_retry_waits_for_the_running_original():
+    s = store()
+    original, release, waiting, outcome = start_original(s, lambda: {"ok": 1})
+    results = []
+    waiter = threading.Thread(target=retry, args=(s, results))
+    waiter.start()
+    waiting.wait(5)
+    release.set()
+    original.join(5)
+    waiter.join(5)
+    assert outcome == results == [{"ok": 1}]
+    assert s.counters == {"executed": 1, "replayed": 1, "conflicts": 0}
+
+
+def test_waiter_of_a_failed_original_is_told_to_retry():
+    s = store()
+
+    def fail():
+        raise HTTPException(500, "down")
+
+    original, release, waiting, outcome = start_original(s, fail)
+    results = []
+    waiter = threading.Thread(target=retry, args=(s, results))
+    waiter.start()
+    waiting.wait(5)
+    release.set()
+    original.join(5)
+    waiter.join(5)
+    assert outcome == [500] and results == [409]
+
+
+def test_retry_gives_up_waiting_after_idempotency_wait(monkeypatch):
+    monkeypatch.setattr(main, "IDEMPOTENCY_WAIT", 0.01)
+    s = store()
+    original, release, _, _ = start_original(s, lambda: {"ok": 1})
+    results = []
+    retry(s, results)
+    assert results == [409]
+    release.set()
+    original.join(5)
+
+
+def test_expired_outcomes_are_forgotten(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(main.time, "monotonic", lambda: now[0])
+    s = IdempotencyStore(ttl=10, max_keys=100)
+    s.run(KEY, "fp", Response(), lambda: {"ok": 1})
+    now[0] += 11
+    assert not s.is_replay(KEY)
+    assert s.run(KEY, "fp", Response(), lambda: {"ok": 2}) == {"ok": 2}
+
+
+def test_oldest_finished_entries_are_evicted_beyond_max_keys():
+    s = IdempotencyStore(ttl=60, max_keys=2)
+    for n in range(3):
+        s.run(("bid", "item-1", f"key-{n}"), "fp", Response(), lambda: {"ok": 1})
+    assert list(s.entries) == [("bid", "item-1", "key-1"), ("bid", "item-1", "key-2")]
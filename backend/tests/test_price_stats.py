@@ -0,0 +1,64 @@
+"""
+compute_price_stats(): the NumPy path and the pure Python fallback must give the
+same stats, item for item, whatever the mix of comp counts in one call.
+"""
+import random
+
+import pytest
+
+import main
+from main import compute_price_stats
+
+
+def python_stats(monkeypatch, prices_by_item):
+    monkeypatch.setattr(main, "np", None)
+    return compute_price_stats(prices_by_item)
+
+
+def assert_same(fast, slow):
+    assert fast.keys() == slow.keys()
+    for item_id, row in slow.items():
+        for column, value in row.items():
+            # summation order differs, so allow a cent either way
+            assert fast[item_id][column] == pytest.approx(value, abs=0.01), (item_id, column)
+
+
+def test_single_item_by_hand(monkeypatch):
+    stats = python_stats(monkeypatch, {"i1": [100, 120, 80, 110, 90]})["i1"]
+    assert stats["comp_count"] == 5
+    assert stats["mean"] == 100 and stats["median"] == 100 and stats["trimmed_mean"] == 100
+    assert (stats["p25"], stats["p75"]) == (90, 110)
+    assert stats["estimate"] == 100
+    assert stats["suggested_starting_price"] == 80
+
+
+def test_outliers_do_not_move_the_estimate(monkeypatch):
+    stats = python_stats(monkeypatch, {"i1": [100, 101, 99, 100, 5000]})["i1"]
+    assert stats["mean"] > 1000
+    assert stats["estimate"] == 100
+
+
+def test_missing_and_non_positive_prices_are_ignored(monkeypatch):
+    prices = {"i1": [None, 0, -5, "40", 60], "i2": [None, 0], "i3": []}
+    stats = python_stats(monkeypatch, prices)
+    assert list(stats) == ["i1"]
+    assert stats["i1"]["comp_count"] == 2 and stats["i1"]["median"] == 50
+
+
+def test_numpy_and_python_paths_agree(monkeypatch):
+    pytest.importorskip("numpy")
+    rng = random.Random(7)
+    prices_by_item = {
+        f"i{n}": [round(rng.lognormvariate(5, 0.6), 2) for _ in range(count)] + extra
+        for n, (count, extra) in enumerate([
+            (1, []), (2, []), (3, [None]), (7, [0]), (10, [25000.0]), (25, []), (60, [1.0, 9999.0]),
+        ])
+    }
+    fast = compute_price_stats(prices_by_item)
+    assert_same(fast, python_stats(monkeypatch, prices_by_item))
+
+
+def test_numpy_path_handles_identical_prices():
+    pytest.importorskip("numpy")
+    fast = compute_price_stats({"i1": [50, 50, 50], "i2": [75]})
+    assert fast["i1"]["estimate"] == 50 and fast["i2"]["estimate"] == 75
@@ -0,0 +1,80 @@
+"""
+Proxy bidding rules of resolve_proxy_bid(). sql/place_bid_atomic.sql implements
+the same rules in SQL; keep both in step with these cases.
+"""
+import pytest
+from fastapi import HTTPException
+
+from main import BidRequest, resolve_proxy_bid
+
+
+def bid(email, amount, max_bid=None, expected=None):
+    return BidRequest(bidder_email=email, bidder_name=email.split("@")[0], bid_amount=amount,
+                      max_bid=max_bid, expected_current_bid=expected)
+
+
+def leader(email, amount, max_amount=None):
+    return {"bid_id": "lead", "bidder_id": "id-" + email, "bidder_email": email, "bidder_name": "lead",
+            "amount": amount, "max_amount": max_amount}
+
+
+def test_first_bid_is_raised_to_the_starting_bid():
+    outcome, row = resolve_proxy_bid(None, 50, 5, bid("a@x.com", 10, max_bid=80))
+    assert outcome == "bidder"
+    assert row["amount"] == 50 and row["max_amount"] == 80
+
+
+def test_first_bid_below_starting_bid_without_max_is_rejected():
+    with pytest.raises(HTTPException) as e:
+        resolve_proxy_bid(None, 50, 5, bid("a@x.com", 10))
+    assert e.value.status_code == 400
+
+
+def test_max_below_amount_is_rejected():
+    with pytest.raises(HTTPException) as e:
+        resolve_proxy_bid(None, 0, 1, bid("a@x.com", 10, max_bid=5))
+    assert e.value.status_code == 400
+
+
+def test_challenger_beats_leader_ceiling_by_one_increment():
+    outcome, row = resolve_proxy_bid(leader("a@x.com", 60, 100), 50, 5, bid("b@x.com", 65, max_bid=200))
+    assert outcome == "bidder"
+    assert row["bidder_email"] == "b@x.com" and row["amount"] == 105 and row["max_amount"] == 200
+
+
+def test_challenger_amount_is_never_lowered():
+    outcome, row = resolve_proxy_bid(leader("a@x.com", 60, 100), 50, 5, bid("b@x.com", 150))
+    assert outcome == "bidder" and row["amount"] == 150 and row["max_amount"] is None
+
+
+def test_leader_maximum_holds_and_is_raised_just_enough():
+    outcome, row = resolve_proxy_bid(leader("a@x.com", 60, 100), 50, 5, bid("b@x.com", 70))
+    assert outcome == "leader"
+    assert row["bidder_email"] == "a@x.com" and row["amount"] == 75 and row["max_amount"] == 100
+
+
+def test_earlier_maximum_wins_ties():
+    outcome, row = resolve_proxy_bid(leader("a@x.com", 60, 100), 50, 5, bid("b@x.com", 65, max_bid=100))
+    assert outcome == "leader"
+    assert row["amount"] == 100 and row["max_amount"] is None
+
+
+def test_leader_raising_only_the_maximum_keeps_the_row():
+    outcome, row = resolve_proxy_bid(leader("a@x.com", 60, 100), 50, 5, bid("A@x.com", 62, max_bid=150))
+    assert outcome == "raise_max"
+    assert row["bid_id"] == "lead" and row["amount"] == 60 and row["max_amount"] == 150
+
+
+def test_leader_bidding_again_keeps_the_higher_maximum():
+    outcome, row = resolve_proxy_bid(leader("a@x.com", 60, 100), 50, 5, bid("a@x.com", 70))
+    assert outcome == "bidder"
+    assert row["amount"] == 70 and row["max_amount"] == 100
+
+
+def test_too_low_and_stale_bids():
+    with pytest.raises(HTTPException) as e:
+        resolve_proxy_bid(leader("a@x.com", 60), 50, 5, bid("b@x.com", 62))
+    assert e.value.status_code == 400
+    with pytest.raises(HTTPException) as e:
+        resolve_proxy_bid(leader("a@x.com", 60), 50, 5, bid("b@x.com", 62, expected=55))
+    assert e.value.status_code == 409
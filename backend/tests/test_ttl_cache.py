@@ -0,0 +1,117 @@
+"""
+TTLCache: LRU bound, expiry, and load tokens that keep a load which raced an
+invalidation (or a direct write) from caching what it read.
+"""
+import asyncio
+
+import pytest
+
+import main
+from main import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(main.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_get_or_load_caches_the_loaded_value(clock):
+    cache = TTLCache(max_entries=10, ttl=60)
+    calls = []
+    assert cache.get_or_load("p1", lambda: calls.append(1) or True) is True
+    assert cache.get_or_load("p1", lambda: calls.append(2) or False) is True
+    assert calls == [1]
+    assert cache.counters["hits"] == 1 and cache.counters["misses"] == 1
+
+
+def test_none_is_not_cached(clock):
+    cache = TTLCache(max_entries=10, ttl=60)
+    assert cache.get_or_load("p1", lambda: None) is None
+    assert cache.get_or_load("p1", lambda: "found") == "found"
+    assert cache.loading == {}
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = TTLCache(max_entries=10, ttl=60)
+    cache.put("p1", True)
+    clock[0] += 59
+    assert cache.get("p1") is True
+    clock[0] += 1
+    assert cache.get("p1") is None
+    assert cache.counters["expired"] == 1
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = TTLCache(max_entries=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.counters["evictions"] == 1
+
+
+def test_load_that_raced_an_invalidation_is_not_cached(clock):
+    cache = TTLCache(max_entries=10, ttl=60)
+
+    def load():
+        # a write lands (and invalidates) while the old value is being read
+        cache.invalidate("p1")
+        return "stale"
+
+    assert cache.get_or_load("p1", load) == "stale"
+    assert cache.get("p1") is None
+    assert cache.loading == {}
+
+
+def test_load_that_raced_invalidate_matching_is_not_cached(clock):
+    cache = TTLCache(max_entries=10, ttl=60)
+    cache.put("a1", "profile-1")
+
+    def load():
+        cache.invalidate_matching(lambda value: value == "profile-1")
+        return "profile-1"
+
+    assert cache.get_or_load("a2", load) == "profile-1"
+    assert cache.get("a1") is None and cache.get("a2") is None
+
+
+def test_direct_write_supersedes_a_load_in_flight(clock):
+    cache = TTLCache(max_entries=10, ttl=60)
+
+    def load():
+        cache.put("p1", "written")
+        return "loaded"
+
+    cache.get_or_load("p1", load)
+    assert cache.get("p1") == "written"
+
+
+def test_failed_load_releases_its_token(clock):
+    cache = TTLCache(max_entries=10, ttl=60)
+
+    def load():
+        raise RuntimeError("db down")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_load("p1", load)
+    assert cache.loading == {}
+    assert cache.get_or_load("p1", lambda: "ok") == "ok"
+
+
+def test_async_load_uses_the_same_tokens(clock):
+    cache = TTLCache(max_entries=10, ttl=60)
+
+    async def stale():
+        cache.invalidate("p1")
+        return "stale"
+
+    async def fresh():
+        return "fresh"
+
+    assert asyncio.run(cache.get_or_load_async("p1", stale)) == "stale"
+    assert cache.get("p1") is None
+    assert asyncio.run(cache.get_or_load_async("p1", fresh)) == "fresh"
+    assert cache.get("p1") == "fresh"
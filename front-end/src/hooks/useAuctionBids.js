@@ -1,20 +1,21 @@
 // Custom hook for fetching all bids for an auction
 import { useState, useEffect, useCallback } from 'react';
-import { getAuctionBids } from '../services/api';
+import { getAuctionBids, subscribeToAuction } from '../services/api';
+import { mergeBid } from '../lib/utils';
 
 /**
- * Hook to fetch and manage all bids for an auction with auto-refresh
+ * Hook to fetch and manage all bids for an auction with live updates
  * @param {string} auctionId - The auction ID
  * @param {Object} options - Configuration options
- * @param {boolean} options.autoRefresh - Whether to auto-refresh (default: true)
- * @param {number} options.refreshInterval - Refresh interval in ms (default: 5000)
+ * @param {boolean} options.autoRefresh - Whether to apply live bid events (default: true)
+ * @param {number} options.refreshInterval - Fallback full refresh interval in ms (default: 60000)
  * @param {boolean} options.enabled - Whether fetching is enabled (default: true)
  * @returns {Object} { allBids, loading, error, refetch }
  */
 export function useAuctionBids(auctionId, options = {}) {
   const {
     autoRefresh = true,
-    refreshInterval = 5000,
+    refreshInterval = 60000,
     enabled = true
   } = options;
 
@@ -44,15 +45,22 @@ export function useAuctionBids(auctionId, options = {}) {
     }
   }, [auctionId, enabled]);
 
-  // Initial fetch and auto-refresh
+  // Initial fetch, live bid events, and a slow fallback refresh
   useEffect(() => {
     fetchAllBids();
     
     if (autoRefresh && enabled) {
+      const unsubscribe = subscribeToAuction(auctionId, {
+        onReady: fetchAllBids,
+        onBid: ({ item_id, bid }) => setAllBids(prev => mergeBid(prev, item_id, bid)),
+      });
       const interval = setInterval(fetchAllBids, refreshInterval);
-      return () => clearInterval(interval);
+      return () => {
+        unsubscribe();
+        clearInterval(interval);
+      };
     }
-  }, [fetchAllBids, autoRefresh, refreshInterval, enabled]);
+  }, [auctionId, fetchAllBids, autoRefresh, refreshInterval, enabled]);
 
   /**
    * Get bids for a specific item
@@ -33,3 +33,15 @@ export async function copyToClipboard(text) {
     return false;
   }
 }
+
+// Add a streamed bid to an { itemId: [bids] } map, keeping each list highest-first.
+// Streamed bids carry no bidder identity, so a bid already in the list (e.g.
+// from the refetch after placing it) is kept as it is.
+export function mergeBid(bidsMap, itemId, bid) {
+  const existing = bidsMap[itemId] || [];
+  if (bid.bid_id && existing.some(b => b.bid_id === bid.bid_id)) return bidsMap;
+  return {
+    ...bidsMap,
+    [itemId]: [bid, ...existing].sort((a, b) => b.amount - a.amount)
+  };
+}
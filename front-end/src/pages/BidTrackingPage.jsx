@@ -23,9 +23,12 @@ import {
 import { Button } from '../components/ui/button';
 import { Card, CardContent, CardHeader, CardTitle } from '../components/ui/card';
 import { Badge } from '../components/ui/badge';
-import { getAuctionBids } from '../services/api';
+import { getAuctionBids, subscribeToAuction } from '../services/api';
 import { formatCurrency, formatDate, copyToClipboard } from '../lib/utils';
 
+// A bid war fires many bid events; refetch the full bid data at most this often
+const BID_REFETCH_THROTTLE_MS = 5000;
+
 function BidTrackingPage() {
   const { auctionId } = useParams();
   const [data, setData] = useState(null);
@@ -50,10 +53,32 @@ function BidTrackingPage() {
 
   useEffect(() => {
     fetchData();
-    // Auto-refresh every 30 seconds
-    const interval = setInterval(fetchData, 30000);
-    return () => clearInterval(interval);
-  }, [fetchData]);
+    // Refresh on live bid events (the public stream carries no bidder details),
+    // batching a burst of bids into one refetch, and apply buy-now events in
+    // place instead of polling; resync on every (re)connect
+    let refetchTimer = null;
+    const refetchSoon = () => {
+      if (refetchTimer) return;
+      refetchTimer = setTimeout(() => {
+        refetchTimer = null;
+        fetchData();
+      }, BID_REFETCH_THROTTLE_MS);
+    };
+    const unsubscribe = subscribeToAuction(auctionId, {
+      onReady: fetchData,
+      onBid: refetchSoon,
+      onBuyNow: ({ item_id }) => setData(prev => prev && {
+        ...prev,
+        items_with_bids: prev.items_with_bids.map(item =>
+          item.item_id === item_id ? { ...item, is_sold: true } : item
+        )
+      }),
+    });
+    return () => {
+      unsubscribe();
+      clearTimeout(refetchTimer);
+    };
+  }, [auctionId, fetchData]);
 
   const handleRefresh = () => {
     setRefreshing(true);
@@ -4,8 +4,9 @@ import { Button } from '../components/ui/button';
 import { Input } from '../components/ui/input';
 import { Badge } from '../components/ui/badge';
 import { Card, CardContent } from '../components/ui/card';
-import { getPublicAuction, placeBid, getAuctionBids } from '../services/api';
+import { getPublicAuction, placeBid, getAuctionBids, subscribeToAuction } from '../services/api';
 import { useAuth } from '../context/AuthContext';
+import { mergeBid } from '../lib/utils';
 import { 
   AlertCircle,
   Package,
@@ -25,6 +26,10 @@ import {
   ItemDetailView
 } from '../components/auction';
 
+// Live events only reach viewers connected to the server instance that took
+// the bid, so bids are also refetched on this slower interval
+const BIDS_FALLBACK_REFRESH_MS = 30000;
+
 // Main Public Auction Page
 const PublicAuction = () => {
   const { auctionId } = useParams();
@@ -108,15 +113,27 @@ const PublicAuction = () => {
     loadAuction();
   }, [auctionId]);
 
-  // Fetch bids initially and refresh every 5 seconds (only if auction not ended)
+  // Fetch bids initially, then apply live bid events (only if auction not ended)
+  // The stream resyncs with a full fetch on every (re)connect, plus a slow fallback refresh
   useEffect(() => {
     fetchAllBids();
     
     if (!auctionEnded) {
-      const interval = setInterval(fetchAllBids, 5000);
-      return () => clearInterval(interval);
+      const unsubscribe = subscribeToAuction(auctionId, {
+        onReady: fetchAllBids,
+        onBid: ({ item_id, bid }) => setAllBids(prev => mergeBid(prev, item_id, bid)),
+        onBuyNow: ({ item_id }) => setItems(prev => prev.map(item =>
+          item.item_id === item_id ? { ...item, is_sold: true } : item
+        )),
+        onClosed: () => setAuctionEnded(true),
+      });
+      const interval = setInterval(fetchAllBids, BIDS_FALLBACK_REFRESH_MS);
+      return () => {
+        unsubscribe();
+        clearInterval(interval);
+      };
     }
-  }, [fetchAllBids, auctionEnded]);
+  }, [auctionId, fetchAllBids, auctionEnded]);
 
   // Handle bidder registration
   const handleRegisterBidder = (bidderData) => {
@@ -9,6 +9,50 @@ const handleResponse = async (response) => {
   return response.json();
 };
 
+// POST with an Idempotency-Key, retried on network failures. The server
+// replays the original outcome for retries, so a bid or purchase is never
+// applied twice even if the first response was lost.
+const postIdempotent = async (url, body, retries = 2) => {
+  const key = crypto.randomUUID();
+  for (let attempt = 0; ; attempt++) {
+    try {
+      return await fetch(url, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'Idempotency-Key': key,
+        },
+        body: JSON.stringify(body),
+      });
+    } catch (err) {
+      if (attempt >= retries) throw err;
+      await new Promise((resolve) => setTimeout(resolve, 500 * 2 ** attempt));
+    }
+  }
+};
+
+// Background jobs (auction deletion, settlement)
+export const getJob = async (jobId) => {
+  const response = await fetch(`${API_BASE_URL}/jobs/${jobId}`);
+  return handleResponse(response);
+};
+
+// Jobs are tracked by the server instance that started them, so a poll that
+// lands on another instance gets a 404; keep polling until the timeout.
+export const waitForJob = async (jobId, intervalMs = 500, timeoutMs = 120000) => {
+  const deadline = Date.now() + timeoutMs;
+  for (;;) {
+    const response = await fetch(`${API_BASE_URL}/jobs/${jobId}`);
+    if (response.status !== 404) {
+      const job = await handleResponse(response);
+      if (job.status === 'completed') return job;
+      if (job.status === 'failed') throw new Error(job.error || 'Job failed');
+    }
+    if (Date.now() >= deadline) throw new Error('Timed out waiting for the job to finish');
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+};
+
 // Auction API
 
 export const createAuction = async (profileId, auctionName) => {
@@ -35,11 +79,20 @@ export const updateAuction = async (auctionId, auctionName) => {
   return handleResponse(response);
 };
 
+// Deletion runs as a background job on the server; resolves once it has finished
 export const deleteAuction = async (auctionId) => {
   const response = await fetch(`${API_BASE_URL}/auctions/${auctionId}`, {
     method: 'DELETE',
   });
-  return handleResponse(response);
+  const { job } = await handleResponse(response);
+  try {
+    return await waitForJob(job.job_id);
+  } catch (err) {
+    // the auction row goes last, so once it is gone the deletion has finished
+    const check = await fetch(`${API_BASE_URL}/auctions/${auctionId}`);
+    if (check.status === 404) return { ...job, status: 'completed' };
+    throw err;
+  }
 };
 
 export const exportAuctionExcel = async (auctionId, auctionName) => {
@@ -89,6 +142,17 @@ export const createItem = async ({
   return handleResponse(response);
 };
 
+// Bulk import from a CSV/XLSX manifest; returns { created, failed, item_ids, errors: [{ row, error }] }
+export const importItems = async (auctionId, file) => {
+  const formData = new FormData();
+  formData.append('file', file);
+  const response = await fetch(`${API_BASE_URL}/auctions/${auctionId}/items/import`, {
+    method: 'POST',
+    body: formData,
+  });
+  return handleResponse(response);
+};
+
 export const listItems = async (auctionId = null, profileId = null) => {
   const params = new URLSearchParams();
   if (auctionId) params.append('auction_id', auctionId);
@@ -150,6 +214,18 @@ export const setImagePrimary = async (itemId, imageId) => {
   return handleResponse(response);
 };
 
+// imageIds: every image of the item in the desired order (first = primary)
+export const reorderItemImages = async (itemId, imageIds) => {
+  const response = await fetch(`${API_BASE_URL}/items/${itemId}/images/order`, {
+    method: 'PUT',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ image_ids: imageIds }),
+  });
+  return handleResponse(response);
+};
+
 // Comps API
 
 export const generateComps = async (itemId, brand = null, model = null, year = null, notes = null) => {
@@ -315,31 +391,20 @@ export const batchUpdateItemAuctionSettings = async (itemIds, settings) => {
   return handleResponse(response);
 };
 
-export const placeBid = async (itemId, bidderEmail, bidderName, bidAmount) => {
-  const response = await fetch(`${API_BASE_URL}/items/${itemId}/bid`, {
-    method: 'POST',
-    headers: {
-      'Content-Type': 'application/json',
-    },
-    body: JSON.stringify({
-      bidder_email: bidderEmail,
-      bidder_name: bidderName,
-      bid_amount: bidAmount,
-    }),
+export const placeBid = async (itemId, bidderEmail, bidderName, bidAmount, maxBid = null) => {
+  const response = await postIdempotent(`${API_BASE_URL}/items/${itemId}/bid`, {
+    bidder_email: bidderEmail,
+    bidder_name: bidderName,
+    bid_amount: bidAmount,
+    ...(maxBid ? { max_bid: maxBid } : {}),
   });
   return handleResponse(response);
 };
 
 export const buyNow = async (itemId, buyerEmail, buyerName) => {
-  const response = await fetch(`${API_BASE_URL}/items/${itemId}/buy-now`, {
-    method: 'POST',
-    headers: {
-      'Content-Type': 'application/json',
-    },
-    body: JSON.stringify({
-      buyer_email: buyerEmail,
-      buyer_name: buyerName,
-    }),
+  const response = await postIdempotent(`${API_BASE_URL}/items/${itemId}/buy-now`, {
+    buyer_email: buyerEmail,
+    buyer_name: buyerName,
   });
   return handleResponse(response);
 };
@@ -349,11 +414,24 @@ export const getItemBids = async (itemId) => {
   return handleResponse(response);
 };
 
-export const getAuctionBids = async (auctionId) => {
-  const response = await fetch(`${API_BASE_URL}/auctions/${auctionId}/all-bids`);
+export const getAuctionBids = async (auctionId, includeBids = true) => {
+  const response = await fetch(`${API_BASE_URL}/auctions/${auctionId}/all-bids?include_bids=${includeBids}`);
   return handleResponse(response);
 };
 
+// Live auction events (Server-Sent Events)
+// Returns an unsubscribe function. onReady fires on every (re)connect so callers can resync.
+export const subscribeToAuction = (auctionId, { onReady, onBid, onBuyNow, onAuctionOpen, onClosed } = {}) => {
+  const source = new EventSource(`${API_BASE_URL}/auctions/${auctionId}/stream`);
+  if (onReady) source.addEventListener('ready', () => onReady());
+  if (onBid) source.addEventListener('bid', (e) => onBid(JSON.parse(e.data)));
+  if (onBuyNow) source.addEventListener('buy_now', (e) => onBuyNow(JSON.parse(e.data)));
+  // not 'open': EventSource fires its own open event on every (re)connect
+  if (onAuctionOpen) source.addEventListener('auction_open', () => onAuctionOpen());
+  if (onClosed) source.addEventListener('closed', () => onClosed());
+  return () => source.close();
+};
+
 export const getOrder = async (orderId) => {
   const response = await fetch(`${API_BASE_URL}/orders/${orderId}`);
   return handleResponse(response);